@@ -1,175 +1,96 @@
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import numpy as np
+import argparse
+import time
 
 from config import *
-from terrain import generate_terrain
-from utils import get_neighbors
-from civ_logic import *
-from visualization import get_color_map, generate_colored_map
+from checkpoint import Checkpointer, load_checkpoint
+from dashboard import Dashboard
+from events import EventLog
+from export import history_meta
+from names import name_to_color
+from history import HistoryRecorder, OwnershipHistory
+from simulation import Simulation
 
 # --- Global histories ---
-territory_history = [[] for _ in range(NUM_CIVS)]
-ownership_history = []
-leaderboard_history = []
+ownership_history = None
 
-# --- Name generation ---
-civ_prefixes = ["Trerthustan", "Jeerbia", "Trauntium", "Mutuastan", "Myrr", "Citan", "Tyrenia", "Nostara", "Yumker", "Branth"]
-civ_suffixes = ["Kingdom", "Union", "Empire", "Federation", "Dominion", "Confederacy", "Alliance", "Realm"]
-name_to_color = {"The Birmingham Barony": [1.0, 0.2, 0.2, 0.5]}
+def make_simulation(seed, resume=None, checkpoint_every=CHECKPOINT_INTERVAL):
+    """A fresh simulation, or the one saved at resume, saving checkpoints as configured"""
+    sim = load_checkpoint(resume) if resume else Simulation(seed)
+    if checkpoint_every:
+        sim.add_observer(Checkpointer(CHECKPOINT_PATH, checkpoint_every))
+    return sim
 
-def generate_civ_name():
-    if np.random.rand() < 0.01:
-        print("BIRMINGHAM!!!")
-        return "The Birmingham Barony"
-    return f"The {np.random.choice(civ_prefixes)} {np.random.choice(civ_suffixes)}"
-
-def assign_color(name):
-    if name in name_to_color:
-        return name_to_color[name]
-    color = np.random.rand(3,).tolist()
-    name_to_color[name] = color
-    return color
-
-def generate_unique_civ_names(num_names):
-    civ_names = []
-    while len(civ_names) < num_names:
-        name = generate_civ_name()
-        if name not in civ_names:
-            civ_names.append(name)
-            assign_color(name)
-    return civ_names
-
-# --- Leaderboard drawing ---
-def draw_leaderboard(ax, ownership, civ_names, cmap_colors, max_rows=15):
-    ax.clear()
-    ax.axis("off")
-    civ_counts = [(i + 2, (ownership == (i + 2)).sum()) for i in range(NUM_CIVS)]
-    civ_counts.sort(key=lambda x: -x[1])
-    spacing = 0.93 / 15
-    for rank, (civ_id, count) in enumerate(civ_counts[:max_rows]):
-        name = civ_names[civ_id - 2] if civ_id - 2 < len(civ_names) else f"Civ {civ_id}"
-        if civ_id < len(cmap_colors):
-            r, g, b, *_ = cmap_colors[civ_id]
-            rgba = (r, g, b, 0.5)
-        else:
-            rgba = (0.5, 0.5, 0.5, 0.5)
-        ax.text(
-            0.05, 0.96 - spacing * rank,
-            f"#{rank+1} {name}",
-            fontsize=11,
-            weight='bold',
-            color='white',
-            bbox=dict(boxstyle="round,pad=0.4", facecolor=rgba, edgecolor='black'),
-            transform=ax.transAxes,
-            clip_on=True
-        )
-    return civ_counts
+def open_event_log(sim, path):
+    """An EventLog appending sim's events to path, or None when path is None"""
+    return EventLog(path).attach(sim) if path else None
 
 # --- Main Simulation ---
-def main():
-    global territory_history, ownership_history, leaderboard_history
-
-    terrain_bool, seed = generate_terrain(SEED)
-    ownership = np.where(terrain_bool, 1, 0)
-    cmap_colors = get_color_map()
-
-    land_indices = np.argwhere(terrain_bool)
-    np.random.shuffle(land_indices)
-    civ_positions = land_indices[:NUM_CIVS]
-    for i, (y, x) in enumerate(civ_positions):
-        ownership[y, x] = i + 2
-
-    frame_counter = 0
-    wars = set()
-    war_intensity = {}
-    peace_treaties = {}
-    war_cooldown = {}
-    last_expansion_frame = np.zeros(NUM_CIVS + 2, dtype=int)
-    civ_names = generate_unique_civ_names(NUM_CIVS)
-
-    # --- Setup figure ---
-    fig = plt.figure(figsize=(16, 8))
-    fig.canvas.manager.set_window_title('Birmingham Simulation')
-    gs = fig.add_gridspec(2, 3, height_ratios=[15, 1], width_ratios=[1.5, 4, 2])
-
-    ax_leaderboard = fig.add_subplot(gs[0, 0])
-    ax_map = fig.add_subplot(gs[0, 1])
-    ax_graph = fig.add_subplot(gs[0, 2])
-
-    im = ax_map.imshow(generate_colored_map(ownership, cmap_colors, get_neighbors), animated=True)
-    ax_map.axis('off')
-    frame_text = ax_map.text(0.02, 0.95, '', color='white', transform=ax_map.transAxes,
-                             fontsize=12, bbox=dict(facecolor='black', alpha=0.5))
-
-    lines = [ax_graph.plot([], [], label=civ_names[i], color=cmap_colors[i + 2])[0] for i in range(NUM_CIVS)]
-    ax_graph.set_xlabel("Frame")
-    ax_graph.set_ylabel("Territory Size")
-    ax_graph.legend(loc='upper left', fontsize=8)
-
-    civ_label_texts = [
-        ax_map.text(0, 0, '', color='black', fontsize=10, ha='center', va='center',
-                    bbox=dict(facecolor='white', alpha=0.5, edgecolor='black', boxstyle='round,pad=0.3'),
-                    visible=False)
-        for _ in range(NUM_CIVS)
-    ]
-
-    # --- Update function ---
-    def update(frame):
-        nonlocal ownership, frame_counter
-        alive_civs = set(np.unique(ownership)) - {0, 1}
-
-        for _ in range(SPEED_MULTIPLIER):
-            increase_war_intensity(wars, war_intensity)
-            ownership[:], expanded = expand_and_fight(
-                ownership, NUM_CIVS, BASE_EXPANSION_CHANCE,
-                wars, war_intensity, frame_counter, last_expansion_frame)
-            for civ_id in range(2, NUM_CIVS + 2):
-                if expanded[civ_id]:
-                    last_expansion_frame[civ_id] = frame_counter
-            declare_war_if_idle(frame_counter, ownership, wars, war_cooldown, peace_treaties, war_intensity)
-            maybe_end_wars(frame_counter, wars, peace_treaties, war_cooldown, war_intensity)
-            check_for_annexations(ownership, wars, civ_names, frame_counter,
-                                  peace_treaties, war_intensity, annexation_logs=[])
-            frame_counter += 1
-
-        im.set_data(generate_colored_map(ownership, cmap_colors, get_neighbors))
-        frame_text.set_text(f"Frame: {frame_counter}")
-
-        for idx, civ_id in enumerate(range(2, NUM_CIVS + 2)):
-            yx = np.argwhere(ownership == civ_id)
-            if len(yx) == 0:
-                civ_label_texts[idx].set_visible(False)
-                continue
-            centroid = yx.mean(axis=0)
-            civ_label_texts[idx].set_position((centroid[1], centroid[0]))
-            civ_label_texts[idx].set_text(civ_names[civ_id - 2])
-            civ_label_texts[idx].set_bbox(dict(facecolor=cmap_colors[civ_id], alpha=0.5,
-                                               edgecolor='black', boxstyle='round,pad=0.3'))
-            civ_label_texts[idx].set_visible(True)
-
-        civ_counts = [(ownership == (i + 2)).sum() for i in range(NUM_CIVS)]
-        for i, count in enumerate(civ_counts):
-            territory_history[i].append(count)
-            lines[i].set_data(range(len(territory_history[i])), territory_history[i])
-
-        ax_graph.set_xlim(0, max(100, frame_counter + 10))
-        ax_graph.set_ylim(0, max(100, max(civ_counts) * 1.2))
-        ax_graph.set_title("Territory Over Time")
-
-        draw_leaderboard(ax_leaderboard, ownership, civ_names, cmap_colors, max_rows=15)
-
-        # Record history every frame
-        ownership_history.append(ownership.copy())
-
-        if len(set(ownership.flatten()) - {0, 1}) <= 1:
-            ani.event_source.stop()
-
-        return [im, frame_text] + lines + civ_label_texts
-
-    ani = animation.FuncAnimation(fig, update, interval=1, blit=False)
-    plt.tight_layout(rect=[0, 0, 1, 0.96])
-    plt.show(block=True)
+def main(seed=SEED, resume=None, checkpoint_every=CHECKPOINT_INTERVAL, events=EVENT_LOG_PATH, save_history=None):
+    global ownership_history
+
+    sim = make_simulation(seed, resume, checkpoint_every)
+    event_log = open_event_log(sim, events)
+    ownership_history = OwnershipHistory(sim.ownership.shape, sim.num_civs, path=HISTORY_PATH,
+                                         chunk_size=sim.config.CHUNK_SIZE)
+    dashboard = Dashboard(sim, name_to_color, history=ownership_history)
+    try:
+        dashboard.run()
+    finally:
+        if event_log:
+            event_log.close()
+    if save_history:
+        ownership_history.save(save_history, **history_meta(sim))
+
+# --- Headless batch mode ---
+def run_headless(seed, max_frames, profile=False, resume=None, checkpoint_every=CHECKPOINT_INTERVAL,
+                 events=EVENT_LOG_PATH, save_history=None):
+    sim = make_simulation(seed, resume, checkpoint_every)
+    event_log = open_event_log(sim, events)
+    if save_history:
+        history = OwnershipHistory(sim.ownership.shape, sim.num_civs, path=HISTORY_PATH,
+                                    chunk_size=sim.config.CHUNK_SIZE)
+        sim.add_observer(HistoryRecorder(sim, history))
+    sim.timer.enabled = profile
+    start = time.perf_counter()
+    try:
+        frames = sim.run_until(lambda s: s.finished, max_frames=max_frames)
+    finally:
+        if event_log:
+            event_log.close()
+    elapsed = time.perf_counter() - start
+    if save_history:
+        history.save(save_history, **history_meta(sim))
+
+    summary = sim.summary()
+    print(f"Frames: {frames} in {elapsed:.2f}s ({frames / max(elapsed, 1e-9):.1f} frames/sec)")
+    print(f"Civs remaining: {summary['alive']}  Annexations: {summary['annexations']}")
+    if summary["winner"]:
+        print(f"Winner: {summary['winner']}")
+    for rank, (name, count) in enumerate(summary["leaderboard"][:15]):
+        print(f"#{rank+1} {name}: {count}")
+    if profile:
+        print(sim.timer.report())
+    return summary
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Civilization simulation")
+    parser.add_argument("--headless", action="store_true", help="run without a display at full speed")
+    parser.add_argument("--frames", type=int, default=10000, help="frame limit for headless runs")
+    parser.add_argument("--seed", type=int, default=SEED, help="run seed (default: config.SEED)")
+    parser.add_argument("--profile", action="store_true", help="print per-phase timings after a headless run")
+    parser.add_argument("--resume", metavar="PATH", help="continue from a checkpoint file")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_INTERVAL, metavar="N",
+                        help="save a checkpoint to config.CHECKPOINT_PATH every N frames (0 disables)")
+    parser.add_argument("--events", default=EVENT_LOG_PATH, metavar="PATH",
+                        help="append a line-delimited JSON event log to PATH")
+    parser.add_argument("--save-history", metavar="PATH",
+                        help="save every frame's ownership grid to PATH (.npz) for export.py")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.headless:
+        run_headless(args.seed, args.frames, args.profile, args.resume, args.checkpoint_every, args.events,
+                     args.save_history)
+    else:
+        main(args.seed, args.resume, args.checkpoint_every, args.events, args.save_history)
\ No newline at end of file
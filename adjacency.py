@@ -0,0 +1,47 @@
+import numpy as np
+
+def border_contacts(ownership, num_civs=None):
+    """Matrix of shared border edges between every pair of civs, in one vectorized pass.
+
+    contacts[a, b] counts the horizontally or vertically adjacent cell pairs
+    where one cell belongs to civ a and the other to civ b. Without num_civs
+    the matrix is sized to the largest id present.
+    """
+    size = num_civs + 2 if num_civs is not None else int(ownership.max()) + 1
+    contacts = np.zeros((size, size), dtype=np.int64)
+    for a, b in ((ownership[:, :-1], ownership[:, 1:]), (ownership[:-1, :], ownership[1:, :])):
+        mask = (a != b) & (a >= 2) & (b >= 2)
+        contacts += np.bincount(a[mask].astype(np.int64) * size + b[mask], minlength=size * size).reshape(size, size)
+    return contacts + contacts.T
+
+class CivAdjacency:
+    """Civ-to-civ border lengths, kept current from the cells that change"""
+
+    def __init__(self, ownership, num_civs=None):
+        self.contacts = border_contacts(ownership, num_civs)
+
+    def neighbors(self, civ_id):
+        """Civs sharing at least one border edge with civ_id"""
+        return set(np.flatnonzero(self.contacts[civ_id]).tolist())
+
+    def occupiers(self, civ_id):
+        """{other_civ: shared edges} around civ_id's territory"""
+        row = self.contacts[civ_id]
+        return {int(civ): int(row[civ]) for civ in np.flatnonzero(row)}
+
+    def border_length(self, civ1, civ2):
+        return int(self.contacts[civ1, civ2])
+
+    def count_edges(self, flat, cells, offsets, sign):
+        """Adds (sign=1) or removes (sign=-1) the edges touching cells of a flat, padded grid.
+
+        Edges between two cells both in cells are counted once. Called with -1
+        before the cells change and +1 after.
+        """
+        neighbors = cells[:, None] + offsets
+        keep = ~(np.isin(neighbors, cells) & (neighbors < cells[:, None]))
+        a = np.broadcast_to(flat[cells][:, None], neighbors.shape)[keep]
+        b = flat[neighbors][keep]
+        mask = (a != b) & (a >= 2) & (b >= 2)
+        np.add.at(self.contacts, (a[mask], b[mask]), sign)
+        np.add.at(self.contacts, (b[mask], a[mask]), sign)
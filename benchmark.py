@@ -0,0 +1,126 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from config import Config
+from simulation import Simulation
+from visualization import get_color_map, MapRenderer
+
+GRID_SIZES = [250, 500, 1000, 2000]
+CIV_COUNTS = [20, 100, 500]
+
+def _setup(grid_size, num_civs, seed, engine, render):
+    cfg = Config(GRID_SIZE=grid_size, NUM_CIVS=num_civs, EXPANSION_ENGINE=engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulation(seed, cfg)
+    renderer = MapRenderer(get_color_map(num_civs))
+    sim.timer.enabled = True
+    if render:
+        sim.add_observer(lambda s: _render(s, renderer))
+    return sim
+
+def peak_memory(grid_size, num_civs, frames, seed, engine, render=True):
+    """Peak traced memory in bytes over a separate, untimed run of the same case.
+
+    tracemalloc slows allocation-heavy Python code a lot, and not equally for
+    every engine, so it is kept out of the timed run.
+    """
+    tracemalloc.start()
+    try:
+        _setup(grid_size, num_civs, seed, engine, render).step(frames)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_case(grid_size, num_civs, frames, seed, engine, render=True, memory=True):
+    """Times one fixed-seed simulation; returns fps, per-phase seconds and peak memory"""
+    sim = _setup(grid_size, num_civs, seed, engine, render)
+    start = time.perf_counter()
+    sim.step(frames)
+    elapsed = time.perf_counter() - start
+    peak = peak_memory(grid_size, num_civs, frames, seed, engine, render) if memory else None
+
+    return {
+        "grid_size": grid_size,
+        "num_civs": num_civs,
+        "engine": engine,
+        "frames": frames,
+        "seed": seed,
+        "fps": frames / elapsed,
+        "seconds": elapsed,
+        "phases": {name: stats["total"] for name, stats in sim.timer.summary().items()},
+        "peak_memory_mb": peak / 2**20 if memory else None,
+        "alive": len(sim.alive_civs()),
+    }
+
+def _render(sim, renderer):
+    with sim.timer.phase("generate_colored_map"):
+        renderer.render(sim.ownership)
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def compare(results, baseline, threshold):
+    """Prints fps changes against a baseline file; returns the cases that slowed down past threshold"""
+    key = lambda case: (case["grid_size"], case["num_civs"], case["engine"], case["frames"], case["seed"])
+    old = {key(case): case for case in baseline["results"]}
+    regressions = []
+    for case in results:
+        before = old.get(key(case))
+        if before is None:
+            continue
+        ratio = case["fps"] / before["fps"]
+        flag = "  REGRESSION" if ratio < 1 - threshold else ""
+        print(f"{case['grid_size']:>5} x {case['num_civs']:<4} {before['fps']:8.2f} -> {case['fps']:8.2f} fps "
+              f"({ratio:6.2f}x){flag}")
+        if flag:
+            regressions.append(case)
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation step pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=GRID_SIZES)
+    parser.add_argument("--civs", type=int, nargs="+", default=CIV_COUNTS)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--engine", default="vectorized")
+    parser.add_argument("--no-render", action="store_true", help="skip timing the map renderer")
+    parser.add_argument("--no-memory", action="store_true", help="skip the extra run that measures peak memory")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1, help="fps drop that counts as a regression")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = []
+    for grid_size in args.sizes:
+        for num_civs in args.civs:
+            case = run_case(grid_size, num_civs, args.frames, args.seed, args.engine, not args.no_render,
+                            not args.no_memory)
+            results.append(case)
+            phases = ", ".join(f"{name} {seconds / args.frames * 1000:.1f}ms" for name, seconds in case["phases"].items())
+            peak = f"  peak {case['peak_memory_mb']:.0f} MB" if case["peak_memory_mb"] is not None else ""
+            print(f"{grid_size:>5} x {num_civs:<4} {case['fps']:8.2f} fps{peak}  [{phases}]")
+
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
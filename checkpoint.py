@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+
+from config import *
+from names import name_to_color
+from simulation import Simulation
+
+CHECKPOINT_VERSION = 4
+
+def save_checkpoint(sim, path):
+    """Writes everything needed to resume sim exactly, including its RNG stream states.
+
+    The file is a compressed .npz: the ownership grid in its smallest dtype, the
+    diplomacy arrays, and a JSON blob for the rest.
+    It is written to a temporary file first so a crash never leaves a torn one.
+    """
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "config": sim.config.as_dict(),
+        "seed": int(sim.seed),
+        "frame": sim.frame,
+        "ownership_dtype": sim.ownership.dtype.str,
+        "civ_names": sim.civ_names,
+        "colors": {name: name_to_color[name] for name in sim.civ_names if name in name_to_color},
+        "annexation_logs": sim.annexation_logs,
+        "annexations": sim.annexations,
+        "rng": sim.rng.state(),
+    }
+
+    diplomacy = sim.diplomacy
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            ownership=sim.ownership.astype(np.min_scalar_type(sim.num_civs + 1)),
+            last_expansion_frame=sim.last_expansion_frame,
+            at_war=diplomacy.at_war,
+            intensity=diplomacy.intensity,
+            treaty_frame=diplomacy.treaty_frame,
+            cooldown=diplomacy.cooldown,
+            last_war_frame=diplomacy.last_war_frame,
+            meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+        )
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    """Rebuilds the Simulation saved at path.
+
+    Stepping the result continues exactly as the original run would have.
+    """
+    with np.load(path) as data:
+        meta = json.loads(data["meta"].tobytes())
+        if meta["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {meta['version']}")
+        config = Config(**{k: v for k, v in meta["config"].items() if k in DEFAULT_CONFIG.as_dict()})
+        ownership = data["ownership"].astype(np.dtype(meta["ownership_dtype"]))
+        sim = Simulation.from_state(config, meta["seed"], ownership, meta["civ_names"])
+        sim.last_expansion_frame[:] = data["last_expansion_frame"]
+        diplomacy = sim.diplomacy
+        for name in ("at_war", "intensity", "treaty_frame", "cooldown", "last_war_frame"):
+            getattr(diplomacy, name)[...] = data[name]
+
+    sim.frame = meta["frame"]
+    sim.annexation_logs = meta["annexation_logs"]
+    sim.annexations = meta["annexations"]
+    sim.rng.set_state(meta["rng"])
+    name_to_color.update(meta["colors"])
+    return sim
+
+class Checkpointer:
+    """Simulation observer that saves a checkpoint every interval frames"""
+
+    def __init__(self, path=CHECKPOINT_PATH, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.interval = interval
+
+    def __call__(self, sim):
+        if self.interval and sim.frame % self.interval == 0:
+            save_checkpoint(sim, self.path)
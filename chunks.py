@@ -0,0 +1,71 @@
+import numpy as np
+
+from config import CHUNK_SIZE
+
+class ChunkIndex:
+    """Splits the map into square chunks and tracks which of them changed.
+
+    Every batch of changed cells bumps self.version and stamps the chunks it
+    touched, so a consumer that remembers the version it last saw can revisit
+    only the chunks changed since (changed_since).
+    """
+
+    def __init__(self, shape, chunk_size=CHUNK_SIZE):
+        self.shape = tuple(shape)
+        self.chunk_size = chunk_size
+        self.rows = -(-self.shape[0] // chunk_size)
+        self.cols = -(-self.shape[1] // chunk_size)
+        self.stamps = np.zeros(self.rows * self.cols, dtype=np.int64)
+        self.version = 0
+
+    def ids(self, ys, xs):
+        """Chunk id of each (y, x) cell"""
+        return (np.asarray(ys) // self.chunk_size) * self.cols + np.asarray(xs) // self.chunk_size
+
+    def mark(self, ys, xs):
+        """Stamps the chunks holding the changed cells (ys, xs)"""
+        self.version += 1
+        self.stamps[self.ids(ys, xs)] = self.version
+
+    def changed_since(self, version):
+        return np.flatnonzero(self.stamps > version)
+
+    def bounds(self, chunk_ids):
+        """(y0, y1, x0, x1) rectangle of each chunk, clipped to the map"""
+        size = self.chunk_size
+        return [(cy * size, min((cy + 1) * size, self.shape[0]), cx * size, min((cx + 1) * size, self.shape[1]))
+                for cy, cx in zip(*np.divmod(np.asarray(chunk_ids), self.cols))]
+
+def pack_chunks(grid, chunk_size=CHUNK_SIZE):
+    """Compact copy of grid: one value per uniform chunk, full cells only for mixed chunks.
+
+    Returns (values, mixed, cells): values holds each chunk's value (meaningless
+    when mixed), mixed flags the chunks whose cells are stored, in chunk order,
+    in the flat cells array.
+    """
+    index = ChunkIndex(grid.shape, chunk_size)
+    values = np.zeros(index.rows * index.cols, dtype=grid.dtype)
+    mixed = np.zeros(index.rows * index.cols, dtype=bool)
+    cells = []
+    for chunk, (y0, y1, x0, x1) in enumerate(index.bounds(np.arange(len(values)))):
+        block = grid[y0:y1, x0:x1]
+        values[chunk] = block[0, 0]
+        if (block != values[chunk]).any():
+            mixed[chunk] = True
+            cells.append(block.ravel())
+    cells = np.concatenate(cells) if cells else np.zeros(0, dtype=grid.dtype)
+    return values, mixed, cells
+
+def unpack_chunks(shape, values, mixed, cells, chunk_size=CHUNK_SIZE):
+    """Inverse of pack_chunks"""
+    index = ChunkIndex(shape, chunk_size)
+    grid = np.empty(shape, dtype=values.dtype)
+    offset = 0
+    for chunk, (y0, y1, x0, x1) in enumerate(index.bounds(np.arange(len(values)))):
+        if mixed[chunk]:
+            count = (y1 - y0) * (x1 - x0)
+            grid[y0:y1, x0:x1] = cells[offset:offset + count].reshape(y1 - y0, x1 - x0)
+            offset += count
+        else:
+            grid[y0:y1, x0:x1] = values[chunk]
+    return grid
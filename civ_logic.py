@@ -1,129 +1,315 @@
 import numpy as np
-import random
 from config import *
 from utils import *
+from adjacency import CivAdjacency
+from connectivity import disconnected_cells
 from scipy.ndimage import label
 
-last_war_frame = {}
-
-def expand_and_fight(ownership, NUM_CIVS, BASE_EXPANSION_CHANCE, wars, war_intensity, frame_counter, last_expansion_frame):
-    global last_war_frame
+def expand_and_fight(ownership, NUM_CIVS, BASE_EXPANSION_CHANCE, diplomacy, frame_counter, last_expansion_frame, frontier=None, cfg=DEFAULT_CONFIG, rng=np.random):
     new_ownership = ownership.copy()
     has_expanded = np.zeros(NUM_CIVS + 2, dtype=bool)
+    size = ownership.shape[0]
+
+    disconnected = frontier.disconnected() if frontier is not None else disconnected_cells(ownership)
+    adjacency = frontier.adjacency if frontier is not None else CivAdjacency(ownership, NUM_CIVS)
+    at_war, intensity = diplomacy.at_war, diplomacy.intensity
+    fronts = diplomacy.fronts(adjacency.contacts)
 
-    disconnected_masks = {civ_id: get_disconnected_mask(ownership, civ_id) for civ_id in range(2, NUM_CIVS + 2)}
+    changed = []
 
     for civ_id in range(2, NUM_CIVS + 2):
-        civ_size = (ownership == civ_id).sum()
-        expansion_chance = BASE_EXPANSION_CHANCE * (1 + civ_size / EXPANSION_SCALE_FACTOR)
-        frontier_cells = get_frontier_cells(ownership, civ_id)
+        if frontier is not None:
+            civ_size = frontier.size(civ_id)
+            frontier_cells = frontier.cells(civ_id)
+        else:
+            civ_size = (ownership == civ_id).sum()
+            frontier_cells = get_frontier_cells(ownership, civ_id)
+        expansion_chance = BASE_EXPANSION_CHANCE * (1 + civ_size / cfg.EXPANSION_SCALE_FACTOR)
 
         if not frontier_cells:
             continue
 
-        random.shuffle(frontier_cells)
+        # Draw the civ's cell order, neighbor orders and rolls in one go rather than per cell
+        order = rng.permutation(len(frontier_cells)).tolist()
+        neighbor_orders = rng.random((len(frontier_cells), 4)).argsort(axis=1).tolist()
+        rolls = rng.random((len(frontier_cells), 4)).tolist()
         expansions_done = 0
 
-        for y, x in frontier_cells:
-            if expansions_done >= GROUP_PUSH_LIMIT:
+        for i, cell in enumerate(order):
+            if expansions_done >= cfg.GROUP_PUSH_LIMIT:
                 break
 
-            neighbors = random.sample(get_neighbors(x, y), len(get_neighbors(x, y)))
-            for nx, ny in neighbors:
+            y, x = frontier_cells[cell]
+            neighbors = get_neighbors(x, y, size)
+            for roll, k in zip(rolls[i], (k for k in neighbor_orders[i] if k < len(neighbors))):
+                nx, ny = neighbors[k]
                 target = ownership[ny, nx]
-                border_pair = tuple(sorted((civ_id, target)))
 
                 # ✅ Peaceful expansion into neutral land
-                if target == 1 and np.random.rand() < expansion_chance * 1.5:
+                if target == 1 and roll < expansion_chance * 1.5:
                     new_ownership[ny, nx] = civ_id
+                    changed.append((ny, nx))
                     has_expanded[civ_id] = True
                     expansions_done += 1
                     break
 
                 # War expansion: smoother but still active
-                elif target >= 2 and target != civ_id and border_pair in wars:
+                elif target >= 2 and at_war[civ_id, target]:
                     friendly_neighbors = sum(
                         ownership[ny2, nx2] == civ_id
-                        for nx2, ny2 in get_neighbors(nx, ny)
+                        for nx2, ny2 in get_neighbors(nx, ny, size)
                         if 0 <= ny2 < ownership.shape[0] and 0 <= nx2 < ownership.shape[1]
                     )
                 
                     if friendly_neighbors == 0:
                         continue  # Don't allow completely isolated attacks
                     
-                    attackers = sum(1 for pair in wars if target in pair and civ_id not in pair)
-                    multi_front_penalty = 1 + (attackers * MULTI_FRONT_SCALING)
+                    attackers = fronts[target] - 1
+                    multi_front_penalty = 1 + (attackers * cfg.MULTI_FRONT_SCALING)
                 
                     # Scale base chance by number of friendly neighbors (smooths borders)
                     neighbor_bias = 0.3 + 0.15 * (friendly_neighbors - 1)
-                    base_chance = neighbor_bias * war_intensity.get(border_pair, 1.0) * multi_front_penalty
+                    base_chance = neighbor_bias * intensity[civ_id, target] * multi_front_penalty
                 
-                    if disconnected_masks[target][ny, nx]:
+                    if disconnected[ny, nx]:
                         base_chance *= 2.0
                 
-                    if np.random.rand() < base_chance:
+                    if roll < base_chance:
                         new_ownership[ny, nx] = civ_id
+                        changed.append((ny, nx))
                         has_expanded[civ_id] = True
                         expansions_done += 1
                 
-                        last_war_frame[civ_id] = frame_counter
-                        last_war_frame[target] = frame_counter
+                        diplomacy.last_war_frame[[civ_id, target]] = frame_counter
                         break
 
+    if frontier is not None and changed:
+        frontier.update(new_ownership, *zip(*changed))
+
     return new_ownership, has_expanded
 
+def expand_and_fight_vectorized(ownership, NUM_CIVS, BASE_EXPANSION_CHANCE, diplomacy, frame_counter, last_expansion_frame, frontier=None, cfg=DEFAULT_CONFIG, rng=np.random):
+    """Whole-grid version of expand_and_fight: every frontier cell of every civ rolls at once.
+
+    With a frontier index the grid is updated in place and returned, and only
+    frontier cells and their neighbors are read, so the cost follows border
+    length rather than map area. Without one a new grid is returned.
+    """
+    has_expanded = np.zeros(NUM_CIVS + 2, dtype=bool)
+
+    # Neighbor lookups go through a grid padded with a ring of water
+    height, width = ownership.shape
+    row = width + 2
+    offsets = np.array([-row, row, -1, 1])
+
+    # Frontier cells: civ tiles touching neutral land or another civ
+    if frontier is not None:
+        flat = frontier.padded.ravel()
+        ys, xs = frontier.coords()
+        civ_sizes = frontier.sizes
+    else:
+        padded = np.pad(ownership, 1, constant_values=0)
+        flat = padded.ravel()
+        frontier_mask = np.zeros(ownership.shape, dtype=bool)
+        for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            neighbor = padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+            frontier_mask |= (neighbor != ownership) & (neighbor != 0)
+        frontier_mask &= ownership >= 2
+        ys, xs = np.nonzero(frontier_mask)
+        civ_sizes = np.bincount(ownership.ravel(), minlength=NUM_CIVS + 2)
+        ownership = ownership.copy()
+    if len(ys) == 0:
+        return ownership, has_expanded
+
+    src = (ys + 1) * row + (xs + 1)
+    civ = flat[src]
+    tgt = src[:, None] + offsets
+    tgt_owner = flat[tgt]
+
+    expansion_chance = BASE_EXPANSION_CHANCE * (1 + civ_sizes / cfg.EXPANSION_SCALE_FACTOR)
+
+    # ✅ Peaceful expansion into neutral land
+    chance = np.where(tgt_owner == 1, expansion_chance[civ][:, None] * 1.5, 0.0)
+
+    # War expansion: only across borders of civs at war with each other
+    # War targets are civ tiles, never padding, so their own neighbors are in bounds too
+    at_war = diplomacy.at_war[civ[:, None], tgt_owner]
+    if at_war.any():
+        cell, direction = np.nonzero(at_war)
+        war_civ, war_tgt = civ[cell], tgt[cell, direction]
+        enemy = flat[war_tgt]
+        friendly_neighbors = (flat[war_tgt[:, None] + offsets] == war_civ[:, None]).sum(axis=1)
+        adjacency = frontier.adjacency if frontier is not None else CivAdjacency(ownership, NUM_CIVS)
+        attackers = diplomacy.fronts(adjacency.contacts)[enemy] - 1
+        multi_front_penalty = 1 + attackers * cfg.MULTI_FRONT_SCALING
+        neighbor_bias = 0.3 + 0.15 * (friendly_neighbors - 1)
+        war_chance = neighbor_bias * diplomacy.intensity[war_civ, enemy] * multi_front_penalty
+
+        disconnected = frontier.disconnected() if frontier is not None else disconnected_cells(ownership)
+        war_chance[disconnected[war_tgt // row - 1, war_tgt % row - 1]] *= 2.0
+        chance[cell, direction] = war_chance
+
+    # One batch of rolls; each frontier cell claims at most one neighbor, picked at random among successes
+    rolls, order_keys = rng.random((2, *tgt.shape))
+    success = rolls < chance
+    claimed = success.any(axis=1)
+    if not claimed.any():
+        return ownership, has_expanded
+    direction = np.where(success, order_keys, 2.0).argmin(axis=1)[claimed]
+    civ = civ[claimed]
+    tgt = tgt[claimed, direction]
+    war_claim = at_war[claimed, direction]
+
+    # GROUP_PUSH_LIMIT: keep a random subset of each civ's claims
+    order = np.lexsort((rng.random(len(civ)), civ))
+    sorted_civ = civ[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_civ, sorted_civ)
+    keep = order[rank < cfg.GROUP_PUSH_LIMIT]
+
+    # Resolve cells claimed by several civs with a random winner
+    keep = keep[rng.permutation(len(keep))]
+    _, first = np.unique(tgt[keep], return_index=True)
+    winners = keep[first]
+
+    war_winners = winners[war_claim[winners]]
+    fighting = np.unique(np.concatenate([civ[war_winners], flat[tgt[war_winners]]]))
+
+    cells = tgt[winners]
+    cy, cx = cells // row - 1, cells % row - 1
+    ownership[cy, cx] = civ[winners]
+    if frontier is not None:
+        frontier.update(ownership, cy, cx)
+    has_expanded[civ[winners]] = True
+
+    diplomacy.last_war_frame[fighting] = frame_counter
+
+    return ownership, has_expanded
 
-def declare_war_if_idle(current_frame, ownership, wars, war_cooldown, peace_treaties, war_intensity):
-    for civ_id in np.unique(ownership):
-        if civ_id < 2: continue
-        if (current_frame - war_cooldown.get(civ_id, -WAR_COOLDOWN*2)) < WAR_COOLDOWN:
+EXPANSION_ENGINES = {
+    "classic": expand_and_fight,
+    "vectorized": expand_and_fight_vectorized,
+}
+
+
+def declare_war_if_idle(current_frame, ownership, diplomacy, frontier=None, cfg=DEFAULT_CONFIG, events=None):
+    """Bordering civs off cooldown and out of treaty go to war, in civ id order, up to MAX_WARS"""
+    free = cfg.MAX_WARS - diplomacy.num_wars
+    if free <= 0:
+        return
+    size = len(diplomacy.cooldown)
+    adjacency = frontier.adjacency if frontier is not None else CivAdjacency(ownership, size - 2)
+
+    ready = current_frame - diplomacy.cooldown >= cfg.WAR_COOLDOWN
+    candidates = ((adjacency.contacts > 0) & ready[:, None] & ~diplomacy.at_war
+                  & (current_frame - diplomacy.treaty_frame > cfg.PEACE_TREATY_COOLDOWN))
+    civs, others = np.nonzero(candidates)
+    if len(civs) == 0:
+        return
+
+    # A pair can come up from both sides; only its first appearance counts
+    pair_ids = np.minimum(civs, others) * size + np.maximum(civs, others)
+    _, first = np.unique(pair_ids, return_index=True)
+    first = np.sort(first)[:free]
+    a, b = np.minimum(civs, others)[first], np.maximum(civs, others)[first]
+    diplomacy.declare(a, b)
+    if events is not None:
+        events.extend({"frame": current_frame, "type": "war_declared", "civs": [x, y]}
+                      for x, y in zip(a.tolist(), b.tolist()))
+
+def maybe_end_wars(frame_counter, diplomacy, cfg=DEFAULT_CONFIG, events=None, rng=np.random):
+    wars = diplomacy.wars()
+    if not wars:
+        return
+    a, b = np.array(wars).T
+    ended = rng.random(len(wars)) < cfg.PEACE_CHANCE
+    diplomacy.make_peace(a[ended], b[ended], frame_counter)
+    if events is not None:
+        events.extend({"frame": frame_counter, "type": "peace", "civs": [x, y]}
+                      for x, y in zip(a[ended].tolist(), b[ended].tolist()))
+
+def increase_war_intensity(diplomacy, cfg=DEFAULT_CONFIG):
+    diplomacy.intensify(cfg.WAR_INTENSITY_GROWTH)
+
+def are_civs_neighbors(ownership, civ1, civ2, adjacency=None):
+    adjacency = adjacency or CivAdjacency(ownership)
+    return max(civ1, civ2) < len(adjacency.contacts) and adjacency.border_length(civ1, civ2) > 0
+
+def _split_territory(ownership, target, tiles_to_give, rng=np.random):
+    """Hands target's tiles to the occupiers, growing each share outward from its own border.
+
+    A multi-source BFS on the target's bounding box: every wave, each unclaimed
+    target cell touching an occupier (or a cell it already claimed) goes to one
+    of them, until each occupier reaches its quota. An occupier can be walled
+    off from its quota by the others, so once no occupier with quota left can
+    grow, the wave carries on without quotas until every reachable cell is
+    taken. Shares stay connected to the occupier, so no disconnected blobs and
+    no remnant of the target. Returns the (ys, xs) that changed.
+    """
+    ys, xs = np.nonzero(ownership == target)
+    y0, y1 = max(ys.min() - 1, 0), ys.max() + 2
+    x0, x1 = max(xs.min() - 1, 0), xs.max() + 2
+    window = ownership[y0:y1, x0:x1]
+    grid = np.pad(window, 1, constant_values=0)
+    inner = grid[1:-1, 1:-1]
+
+    quota = np.zeros(grid.max() + 1, dtype=np.int64)
+    for civ, count in tiles_to_give.items():
+        quota[civ] = count
+    occupiers = list(tiles_to_give)
+    unbounded = False
+
+    while True:
+        candidates = np.stack([grid[:-2, 1:-1], grid[2:, 1:-1], grid[1:-1, :-2], grid[1:-1, 2:]])
+        valid = (quota[candidates] > 0) & (inner == target)
+        reached = valid.any(axis=0)
+        if not reached.any():
+            if unbounded:
+                break
+            # Hand whatever is still unclaimed to the occupiers that can reach it
+            quota[occupiers] = inner.size
+            unbounded = True
             continue
 
-        neighbors = {ownership[ny, nx] for y, x in np.argwhere(ownership == civ_id)
-                     for nx, ny in get_neighbors(x, y) if ownership[ny, nx] >= 2 and ownership[ny, nx] != civ_id}
-
-        for other in neighbors:
-            pair = tuple(sorted((civ_id, other)))
-            if pair not in wars and (current_frame - peace_treaties.get(pair, -PEACE_TREATY_COOLDOWN*2)) > PEACE_TREATY_COOLDOWN:
-                if len(wars) < MAX_WARS:
-                    wars.add(pair)
-                    war_intensity[pair] = 1.0
-
-def maybe_end_wars(frame_counter, wars, peace_treaties, war_cooldown, war_intensity):
-    ended = {pair for pair in wars if np.random.rand() < PEACE_CHANCE}
-    for pair in ended:
-        peace_treaties[pair] = frame_counter
-        war_cooldown[pair[0]] = frame_counter
-        war_cooldown[pair[1]] = frame_counter
-        war_intensity.pop(pair, None)
-    wars.difference_update(ended)
-
-def increase_war_intensity(wars, war_intensity):
-    for pair in wars:
-        war_intensity[pair] = min(war_intensity.get(pair, 1.0) + WAR_INTENSITY_GROWTH, 3.0)
-
-def are_civs_neighbors(ownership, civ1, civ2):
-    mask = (ownership == civ1)
-    shifts = [np.roll(ownership, s, axis=i) for i in (1, 0) for s in (-1, 1)]
-    return any(((s == civ2) & mask).any() for s in shifts)
-
-def check_for_annexations(ownership, wars, civ_names, frame_counter, peace_treaties, war_intensity, annexation_logs, max_logs=5):
-    civs = list(set(np.unique(ownership)) - {0, 1})
+        # Cells touching several occupiers go to one of them at random
+        keys = np.where(valid, rng.random(valid.shape), -1.0)
+        cy, cx = np.nonzero(reached)
+        civs = candidates[keys.argmax(axis=0)[cy, cx], cy, cx]
+
+        # Keep a random subset of each occupier's wave that fits its remaining quota
+        order = np.lexsort((rng.random(len(civs)), civs))
+        sorted_civs = civs[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_civs, sorted_civs)
+        keep = order[rank < quota[sorted_civs]]
+        inner[cy[keep], cx[keep]] = civs[keep]
+        quota -= np.bincount(civs[keep], minlength=len(quota))
+
+    changed = inner != window
+    window[changed] = inner[changed]
+    ys, xs = np.nonzero(changed)
+    return ys + y0, xs + x0
+
+def check_for_annexations(ownership, diplomacy, civ_names, frame_counter, annexation_logs, max_logs=5, frontier=None, cfg=DEFAULT_CONFIG, events=None, rng=np.random):
+    """Annexes civs whose borders are mostly occupied; returns the list of annexed civ ids"""
+    if frontier is not None:
+        civs, tile_counts, adjacency = frontier.alive(), frontier.sizes, frontier.adjacency
+    else:
+        tile_counts = np.bincount(ownership.ravel())
+        civs = [civ for civ in np.flatnonzero(tile_counts) if civ >= 2]
+        adjacency = CivAdjacency(ownership, len(tile_counts) - 2)
+
+    annexed = []
     for target in civs:
-        total_tiles = (ownership == target).sum()
+        if len(annexed) >= cfg.MAX_ANNEXATIONS_PER_FRAME:
+            break
+        total_tiles = tile_counts[target]
         if total_tiles == 0:
             continue
 
         # Count border contribution from aggressors
-        occupiers = {}
-        for y, x in np.argwhere(ownership == target):
-            for nx, ny in get_neighbors(x, y):
-                occupier = ownership[ny, nx]
-                if occupier >= 2 and occupier != target:
-                    occupiers[occupier] = occupiers.get(occupier, 0) + 1
+        occupiers = adjacency.occupiers(target)
 
         total_occupied = sum(occupiers.values())
-        if total_occupied == 0 or total_occupied / total_tiles < ANNEXATION_THRESHOLD:
+        if total_occupied == 0 or total_occupied / total_tiles < cfg.ANNEXATION_THRESHOLD:
             continue
 
         # Log the annexation event
@@ -132,6 +318,9 @@ def check_for_annexations(ownership, wars, civ_names, frame_counter, peace_treat
         )
         if len(annexation_logs) > max_logs:
             annexation_logs.pop(0)
+        if events is not None:
+            events.append({"frame": frame_counter, "type": "annexation", "civ": int(target), "tiles": int(total_tiles),
+                           "by": {str(civ): count for civ, count in occupiers.items()}})
 
         # Proportional land split
         proportions = {civ: count / total_occupied for civ, count in occupiers.items()}
@@ -141,43 +330,15 @@ def check_for_annexations(ownership, wars, civ_names, frame_counter, peace_treat
         for i in range(remainder):
             tiles_to_give[keys[i % len(keys)]] += 1
 
-        # Assign tiles using frontier expansion (no disconnected blobs)
-        target_tiles = set(zip(*np.where(ownership == target)))
-        available_tiles = set(target_tiles)
-        reachable = {civ: set() for civ in tiles_to_give}
-        assigned = {civ: 0 for civ in tiles_to_give}
-
-        # Initialize reachable frontiers (tiles bordering the civ)
-        for civ in tiles_to_give:
-            for y, x in np.argwhere(ownership == civ):
-                for nx, ny in get_neighbors(x, y):
-                    if (ny, nx) in available_tiles:
-                        reachable[civ].add((ny, nx))
-
-        # Spread out until civs reach their tile limits or no tiles left
-        while any(tiles_to_give[civ] > assigned[civ] and reachable[civ] for civ in reachable):
-            for civ in reachable:
-                if assigned[civ] >= tiles_to_give[civ] or not reachable[civ]:
-                    continue
-                chosen = reachable[civ].pop()
-                if chosen not in available_tiles:
-                    continue
-
-                y, x = chosen
-                ownership[y, x] = civ
-                assigned[civ] += 1
-                available_tiles.remove(chosen)
-
-                for nx, ny in get_neighbors(x, y):
-                    if (ny, nx) in available_tiles:
-                        reachable[civ].add((ny, nx))
-
-        # Clean up war state
-        wars.difference_update({pair for pair in wars if target in pair})
-        war_intensity = {k: v for k, v in war_intensity.items() if target not in k}
-        peace_treaties = {k: v for k, v in peace_treaties.items() if target not in k}
-
-        # Stop after one annexation per frame
-        break
-
-print(ANNEXATION_THRESHOLD)
+        ys, xs = _split_territory(ownership, target, tiles_to_give, rng)
+        if frontier is not None:
+            frontier.update(ownership, ys, xs)
+        else:
+            tile_counts = np.bincount(ownership.ravel(), minlength=len(tile_counts))
+            adjacency = CivAdjacency(ownership, len(tile_counts) - 2)
+
+        diplomacy.forget(target)
+
+        annexed.append(target)
+
+    return annexed
@@ -6,6 +6,7 @@
 GRID_SIZE = 250                    # Size of the map (GRID_SIZE x GRID_SIZE)
 NUM_CIVS = 20                      # Number of civilizations (20 Recommended max)
 SEED = None                        # Set to None to randomize
+CHUNK_SIZE = 64                    # Side of the square chunks used to track which parts of the map change
     
 #----Map Config----#       
 SCALE = 75.0                       # Zoom - 100 (closer) 1 (farther)
@@ -13,6 +14,8 @@ OCTAVES = 6                        # Complexity - 1 (simple) 10 (complex)
 PERSISTENCE = 0.5                  # Roughness - 0 (smooth) 1 (rough)
 LACUNARITY = 2.0                   # Detail/Texture - 1 (smooth) 10 (detailed)
 LAND_THRESHOLD = 0.4               # Water Level - 0 (all land) 1 (all water)
+TERRAIN_CACHE_DIR = ".terrain_cache"  # Where generated heightmaps are cached (None disables)
+TERRAIN_WORKERS = 1                # Processes used to generate very large maps
     
 #----Civ Logic Config----#   
 # Expansion  
@@ -21,8 +24,9 @@ EXPANSION_SCALE_FACTOR = 500       # How much civ size affects expansion chance
 GROUP_PUSH_LIMIT = 60              # Max number of expansions per civ per frame
 WAR_INTENSITY_GROWTH = 0.1         # How much war intensity grows per frame
 MULTI_FRONT_SCALING = 0.2          # How much multi-front wars increase expansion chance
+EXPANSION_ENGINE = "vectorized"    # "classic" (per-cell loop) or "vectorized" (whole-grid arrays)
 # Speed
-SPEED_MULTIPLIER = 1               # How many frames to process per update
+SPEED_MULTIPLIER = 1               # Minimum frames to process per displayed update
 # Cooldowns
 WAR_COOLDOWN = 50                  # Frames before a civ can declare war again
 PEACE_TREATY_COOLDOWN = 100        # Frames before a peace treaty expires
@@ -30,4 +34,60 @@ PEACE_TREATY_COOLDOWN = 100        # Frames before a peace treaty expires
 PEACE_CHANCE = 0.005               # Chance of peace treaty per frame
 # Limits
 MAX_WARS = 5                       # Max number of wars allowed at once
-ANNEXATION_THRESHOLD = 0.3         # How much of a civ's territory must be disconnected to anne
\ No newline at end of file
+ANNEXATION_THRESHOLD = 0.3         # How much of a civ's territory must be disconnected to anne
+MAX_ANNEXATIONS_PER_FRAME = 1      # How many civs can be annexed in a single frame
+
+#----History Config----#
+HISTORY_KEYFRAME_INTERVAL = 100    # Frames between full snapshots in the ownership history
+HISTORY_PATH = None                # File to spill ownership history to (None keeps it in memory)
+
+#----Event Log Config----#
+EVENT_LOG_PATH = None              # Line-delimited JSON file to stream events to (None disables)
+EVENT_BUFFER_SIZE = 1000           # Events held in memory before they are written out
+TERRITORY_EVERY = 1                # Log territory counts every N frames (0 disables)
+
+#----Checkpoint Config----#
+CHECKPOINT_PATH = "checkpoint.npz" # Where checkpoints are written
+CHECKPOINT_INTERVAL = 0            # Frames between automatic checkpoints (0 disables them)
+
+#----Display Config----#
+BLIT = True                        # Redraw only the changing artists each frame
+TARGET_FPS = 30                    # Displayed frames per second the live view aims for
+MAX_STEPS_PER_FRAME = 50           # Cap on simulation frames run between two displayed frames
+GRAPH_HISTORY = 5000               # Most recent frames kept in the territory graph
+BACKGROUND_SIMULATION = True       # Step the simulation on a worker thread instead of between redraws
+SIMULATION_MAX_FPS = None          # Cap on background simulation frames per second (None = unlimited)
+
+
+#========================#
+#    Per-run Config      #
+#========================#
+
+_DEFAULTS = {name: value for name, value in dict(globals()).items() if name.isupper()}
+
+class Config:
+    """One run's settings: the defaults above, with any of them overridden.
+
+    Attribute names match the module constants, so code reads cfg.MAX_WARS
+    where it used to read MAX_WARS. Plain attributes keep it picklable for
+    worker processes.
+    """
+
+    def __init__(self, **overrides):
+        unknown = set(overrides) - set(_DEFAULTS)
+        if unknown:
+            raise TypeError(f"Unknown config option(s): {', '.join(sorted(unknown))}")
+        self.__dict__.update(_DEFAULTS)
+        self.__dict__.update(overrides)
+
+    def replace(self, **overrides):
+        return Config(**{**self.as_dict(), **overrides})
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        changed = {k: v for k, v in self.__dict__.items() if _DEFAULTS[k] != v}
+        return f"Config({', '.join(f'{k}={v!r}' for k, v in changed.items())})"
+
+DEFAULT_CONFIG = Config()
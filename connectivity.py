@@ -0,0 +1,123 @@
+import numpy as np
+from scipy.ndimage import label, find_objects
+
+# The single-pass labeling works on a 2x upsampled grid; past this many cells
+# relabeling civ by civ inside their boxes needs far less memory
+FULL_PASS_MAX_CELLS = 4096 * 4096
+
+def label_territories(ownership):
+    """Connected components of every civ's territory in a single labeling pass.
+
+    The grid is upsampled 2x so that the cells between two tiles are only set
+    when both tiles belong to the same civ; labeling that grid keeps
+    neighboring civs apart. Returns (labels, sizes, owners) where sizes and
+    owners are indexed by label (label 0 is non-civ land and water).
+    """
+    height, width = ownership.shape
+    civ = ownership >= 2
+    fine = np.zeros((2 * height - 1, 2 * width - 1), dtype=bool)
+    fine[::2, ::2] = civ
+    fine[::2, 1::2] = civ[:, :-1] & (ownership[:, :-1] == ownership[:, 1:])
+    fine[1::2, ::2] = civ[:-1, :] & (ownership[:-1, :] == ownership[1:, :])
+    labels, num = label(fine)
+    labels = labels[::2, ::2]
+
+    sizes = np.bincount(labels.ravel(), minlength=num + 1)
+    sizes[0] = 0
+    owners = np.zeros(num + 1, dtype=ownership.dtype)
+    owners[labels.ravel()] = ownership.ravel()
+    owners[0] = 0
+    return labels, sizes, owners
+
+def disconnected_cells(ownership):
+    """True on civ tiles outside their civ's largest connected region"""
+    labels, sizes, owners = label_territories(ownership)
+    largest = _largest_labels(sizes, owners, int(ownership.max()) + 1)
+    return (ownership >= 2) & (labels != largest[ownership])
+
+def _largest_labels(sizes, owners, num_ids):
+    """For each civ id, the label of its biggest component"""
+    num = len(sizes)
+    best = np.zeros(num_ids, dtype=np.int64)
+    np.maximum.at(best, owners[1:], sizes[1:] * num + np.arange(1, num))
+    return best % num
+
+class Connectivity:
+    """Cached disconnected-territory mask, relabeled only for civs whose land changed.
+
+    Each civ keeps a bounding box that only ever grows between full passes.
+    Dirty civs are relabeled inside their box; when the dirty boxes would
+    cover more than the whole map, one full single-pass labeling is cheaper.
+    The first call labels every civ inside its (initially tiny) box.
+    """
+
+    def __init__(self, ownership):
+        self.mask = np.zeros(ownership.shape, dtype=bool)
+        self._boxes = self._find_boxes(ownership)
+        self.dirty = set(self._boxes)
+
+    @staticmethod
+    def _find_boxes(ownership):
+        return {civ_id: [s[0].start, s[0].stop, s[1].start, s[1].stop]
+                for civ_id, s in enumerate(find_objects(ownership), 1) if s is not None and civ_id >= 2}
+
+    def _full(self, ownership):
+        self.mask = disconnected_cells(ownership)
+        self._boxes = self._find_boxes(ownership)
+        self.dirty.clear()
+
+    def note_changes(self, ys, xs, old_owners, new_owners, ownership=None):
+        """Marks the civs whose regions may have changed with the cells (ys, xs) as dirty.
+
+        Losing cells can split a civ, so losers are always dirty. Given the
+        updated grid, a civ that only took neutral land stays clean unless a new
+        cell touches one of its disconnected cells and may join it back up.
+        """
+        self.dirty.update(int(c) for c in np.unique(old_owners) if c >= 2)
+        for civ_id in np.unique(new_owners):
+            if civ_id < 2:
+                continue
+            civ_id = int(civ_id)
+            mine = new_owners == civ_id
+            y0, y1 = ys[mine].min(), ys[mine].max() + 1
+            x0, x1 = xs[mine].min(), xs[mine].max() + 1
+            box = self._boxes.setdefault(civ_id, [y0, y1, x0, x1])
+            box[:] = [min(box[0], y0), max(box[1], y1), min(box[2], x0), max(box[3], x1)]
+            if civ_id in self.dirty:
+                continue
+            if ownership is None or (old_owners[mine] >= 2).any() or \
+                    self._touches_disconnected(ownership, ys[mine], xs[mine], civ_id):
+                self.dirty.add(civ_id)
+
+    def _touches_disconnected(self, ownership, ys, xs, civ_id):
+        height, width = ownership.shape
+        for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            ny, nx = ys + dy, xs + dx
+            inside = (ny >= 0) & (ny < height) & (nx >= 0) & (nx < width)
+            ny, nx = ny[inside], nx[inside]
+            if (self.mask[ny, nx] & (ownership[ny, nx] == civ_id)).any():
+                return True
+        return False
+
+    def disconnected(self, ownership):
+        """Up-to-date mask of disconnected civ tiles for the given grid"""
+        if not self.dirty:
+            return self.mask
+        boxes = [(civ_id, self._boxes[civ_id]) for civ_id in self.dirty if civ_id in self._boxes]
+        if sum((b[1] - b[0]) * (b[3] - b[2]) for _, b in boxes) > ownership.size and ownership.size <= FULL_PASS_MAX_CELLS:
+            self._full(ownership)
+            return self.mask
+
+        for civ_id, (y0, y1, x0, x1) in boxes:
+            civ_mask = ownership[y0:y1, x0:x1] == civ_id
+            labels, num = label(civ_mask)
+            if num > 1:
+                sizes = np.bincount(labels.ravel())
+                sizes[0] = 0
+                # Ties go to the last label, as in _largest_labels
+                civ_disconnected = labels != len(sizes) - 1 - np.argmax(sizes[::-1])
+            else:
+                civ_disconnected = np.zeros_like(civ_mask)
+            self.mask[y0:y1, x0:x1][civ_mask] = civ_disconnected[civ_mask]
+        self.dirty.clear()
+        return self.mask
@@ -0,0 +1,289 @@
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from config import *
+from checkpoint import save_checkpoint
+from runner import BackgroundRunner
+from visualization import get_color_map, MapRenderer
+
+class TerritoryBuffer:
+    """Preallocated ring buffer of per-civ territory counts for the graph.
+
+    Every sample is written twice, capacity apart, so the most recent
+    window is always one contiguous slice and never needs copying.
+    """
+
+    def __init__(self, num_civs, capacity=GRAPH_HISTORY):
+        self.capacity = capacity
+        self._frames = np.zeros(2 * capacity, dtype=np.float64)
+        self._counts = np.zeros((2 * capacity, num_civs), dtype=np.float64)
+        self._next = 0
+        self.size = 0
+
+    def append(self, frame, counts):
+        i = self._next
+        self._frames[i] = self._frames[i + self.capacity] = frame
+        self._counts[i] = self._counts[i + self.capacity] = counts
+        self._next = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def window(self):
+        """(frames, counts) of the retained samples, oldest first, as views"""
+        start = self._next + self.capacity - self.size
+        return self._frames[start:start + self.size], self._counts[start:start + self.size]
+
+class Dashboard:
+    """Live map, leaderboard and territory graph built from persistent artists.
+
+    With blitting each axes keeps a cached background and only its animated
+    artists are redrawn onto it; the leaderboard is only redrawn when the
+    ranking changes, and the whole figure only when the graph limits grow or
+    the window is resized.
+
+    In the background mode the simulation runs on a BackgroundRunner and each
+    displayed frame draws the newest snapshot, so neither side waits for the
+    other. Otherwise each displayed frame advances the simulation itself by as
+    many steps as fit the frame budget for target_fps (never fewer than
+    SPEED_MULTIPLIER). Space pauses; "+" and "-" change the background speed;
+    "c" saves a checkpoint to CHECKPOINT_PATH.
+    """
+
+    def __init__(self, sim, name_to_color=None, history=None, blit=BLIT, target_fps=TARGET_FPS, max_rows=15,
+                 background=BACKGROUND_SIMULATION):
+        self.sim = sim
+        self.history = history
+        self.runner = BackgroundRunner(sim, SIMULATION_MAX_FPS) if background else None
+        self.paused = False
+        self._frame = sim.frame
+        self._drawn_version = self._recorded_version = sim.frontier.chunks.version
+        self.blit = blit
+        self.target_fps = target_fps
+        self.steps = SPEED_MULTIPLIER
+        self.max_rows = max_rows
+        self.timer = sim.timer
+        self._draw_time = None
+        self._step_end = None
+        self._ranking = None
+        self._backgrounds = {}
+
+        num_civs = sim.num_civs
+        self.renderer = MapRenderer(get_color_map(num_civs), sim.civ_names, name_to_color)
+        self.colors = self.renderer.colors
+        self.territory = TerritoryBuffer(num_civs)
+        self._ys, self._xs = np.indices(sim.ownership.shape)
+
+        if history is not None:
+            # Start with the current grid, like HistoryRecorder, so history frame N is sim frame N
+            history.append(sim.ownership)
+            sim.add_observer(self._record)
+
+        self.fig = plt.figure(figsize=(16, 8))
+        self.fig.canvas.manager.set_window_title('Birmingham Simulation')
+        gs = self.fig.add_gridspec(2, 3, height_ratios=[15, 1], width_ratios=[1.5, 4, 2])
+        self.ax_leaderboard = self.fig.add_subplot(gs[0, 0])
+        self.ax_map = self.fig.add_subplot(gs[0, 1])
+        self.ax_graph = self.fig.add_subplot(gs[0, 2])
+
+        self.im = self.ax_map.imshow(self.renderer.render(sim.ownership), animated=True)
+        self.ax_map.axis('off')
+        self.frame_text = self.ax_map.text(0.02, 0.95, '', color='white', transform=self.ax_map.transAxes,
+                                           fontsize=12, bbox=dict(facecolor='black', alpha=0.5), animated=True)
+        self.civ_label_texts = [
+            self.ax_map.text(0, 0, name, color='black', fontsize=10, ha='center', va='center',
+                             bbox=dict(facecolor=self.colors[i + 2], alpha=0.5, edgecolor='black',
+                                       boxstyle='round,pad=0.3'),
+                             visible=False, clip_on=True, animated=True)
+            for i, name in enumerate(sim.civ_names)
+        ]
+
+        self.lines = [self.ax_graph.plot([], [], label=sim.civ_names[i], color=self.colors[i + 2], animated=True)[0]
+                      for i in range(num_civs)]
+        self.ax_graph.set_xlabel("Frame")
+        self.ax_graph.set_ylabel("Territory Size")
+        self.ax_graph.set_title("Territory Over Time")
+        self.ax_graph.legend(loc='upper left', fontsize=8)
+        self.ax_graph.set_xlim(0, 100)
+        self.ax_graph.set_ylim(0, 100)
+
+        self.ax_leaderboard.axis("off")
+        spacing = 0.93 / 15
+        self.leaderboard_texts = [
+            self.ax_leaderboard.text(0.05, 0.96 - spacing * rank, '', fontsize=11, weight='bold', color='white',
+                                     bbox=dict(boxstyle="round,pad=0.4", facecolor=(0.5, 0.5, 0.5, 0.5),
+                                               edgecolor='black'),
+                                     transform=self.ax_leaderboard.transAxes, clip_on=True, animated=True)
+            for rank in range(max_rows)
+        ]
+
+        self._animated = {
+            self.ax_map: [self.im, self.frame_text] + self.civ_label_texts,
+            self.ax_graph: self.lines,
+            self.ax_leaderboard: self.leaderboard_texts,
+        }
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+        self.fig.canvas.mpl_connect("close_event", self._on_close)
+        # Press "p" to start profiling; press it again to print the per-phase report
+        self.fig.canvas.mpl_connect("key_press_event", self._on_key)
+
+    def _changed_regions(self, version):
+        chunks = self.sim.frontier.chunks
+        return chunks.bounds(chunks.changed_since(version)), chunks.version
+
+    def _record(self, sim):
+        with self.timer.phase("ownership_history"):
+            regions, self._recorded_version = self._changed_regions(self._recorded_version)
+            self.history.append(sim.ownership, regions)
+
+    def _on_key(self, event):
+        if event.key == "p" and not self.timer.toggle():
+            print(f"Profile over {self.timer.counts.get('expand_and_fight', 0)} frames:")
+            print(self.timer.report())
+            self.timer.reset()
+        elif event.key == " ":
+            self.paused = not self.paused
+            if self.runner is not None:
+                self.runner.toggle_pause()
+            self._show_status()
+            if self.blit and self._backgrounds:
+                self._blit([self.ax_map])
+        elif event.key == "c":
+            if self.runner is not None:
+                self.runner.call_soon(self._checkpoint)
+            else:
+                self._checkpoint(self.sim)
+        elif self.runner is not None and event.key in ("+", "="):
+            self.runner.faster()
+        elif self.runner is not None and event.key == "-":
+            self.runner.slower()
+
+    def _checkpoint(self, sim):
+        save_checkpoint(sim, CHECKPOINT_PATH)
+        print(f"Checkpoint at frame {sim.frame} saved to {CHECKPOINT_PATH}")
+
+    def _on_close(self, event):
+        if self.runner is not None:
+            self.runner.stop()
+
+    def _show_status(self):
+        self.frame_text.set_text(f"Frame: {self._frame}" + (" (paused)" if self.paused else ""))
+
+    def _on_draw(self, event):
+        """After a full draw, recaches the axes backgrounds and paints the animated artists on top"""
+        if not self.blit:
+            return
+        canvas = self.fig.canvas
+        self._backgrounds = {ax: canvas.copy_from_bbox(ax.bbox) for ax in self._animated}
+        for ax, artists in self._animated.items():
+            for artist in artists:
+                ax.draw_artist(artist)
+
+    def _blit(self, axes):
+        canvas = self.fig.canvas
+        for ax in axes:
+            canvas.restore_region(self._backgrounds[ax])
+            for artist in self._animated[ax]:
+                ax.draw_artist(artist)
+            canvas.blit(ax.bbox)
+        canvas.flush_events()
+
+    def update(self):
+        if self.runner is not None:
+            snapshot = self.runner.latest()
+            if snapshot is None:
+                if self.runner.error is not None:
+                    self.event_source.stop()
+                return
+            frame, ownership, counts, finished, regions = snapshot
+        elif self.paused:
+            return
+        else:
+            self._step_adaptively()
+            frame, ownership, counts, finished = self.sim.frame, self.sim.ownership, self.sim.territory(), self.sim.finished
+            regions, self._drawn_version = self._changed_regions(self._drawn_version)
+
+        changed = self.draw_frame(frame, ownership, counts, regions)
+        if not self.blit:
+            self.fig.canvas.draw_idle()
+        elif self._backgrounds:
+            self._blit(changed)
+        if self.runner is None:
+            self._draw_time = time.perf_counter() - self._step_end
+        if finished:
+            self.event_source.stop()
+
+    def _step_adaptively(self):
+        start = time.perf_counter()
+        self.sim.step(self.steps)
+        self._step_end = time.perf_counter()
+
+        if self._draw_time is not None:
+            # Give the frame budget left after the last frame's drawing to the next frame's steps
+            per_step = (self._step_end - start) / self.steps
+            fit = int((1.0 / self.target_fps - self._draw_time) / max(per_step, 1e-9))
+            self.steps = int(np.clip(fit, SPEED_MULTIPLIER, MAX_STEPS_PER_FRAME))
+
+    def draw_frame(self, frame, ownership, counts, regions=None):
+        """Updates the artists for one frame; returns the axes whose artists changed.
+
+        regions lists the rectangles changed since the last drawn frame (None diffs the whole grid).
+        """
+        with self.timer.phase("generate_colored_map"):
+            self.im.set_data(self.renderer.render(ownership, regions))
+        self._frame = frame
+        self._show_status()
+
+        with self.timer.phase("civ_labels"):
+            flat = ownership.ravel()
+            size = len(counts)
+            sum_y = np.bincount(flat, weights=self._ys.ravel(), minlength=size)
+            sum_x = np.bincount(flat, weights=self._xs.ravel(), minlength=size)
+            for idx, label in enumerate(self.civ_label_texts):
+                civ_id = idx + 2
+                if counts[civ_id] == 0:
+                    label.set_visible(False)
+                    continue
+                label.set_position((sum_x[civ_id] / counts[civ_id], sum_y[civ_id] / counts[civ_id]))
+                label.set_visible(True)
+
+        with self.timer.phase("territory_graph"):
+            self.territory.append(frame, counts[2:])
+            frames, history = self.territory.window()
+            for i, line in enumerate(self.lines):
+                line.set_data(frames, history[:, i])
+            self._grow_limits(frames[0], frame, counts[2:].max())
+
+        with self.timer.phase("draw_leaderboard"):
+            ranking = np.argsort(-counts[2:], kind="stable")[:self.max_rows] + 2
+            if self._ranking is not None and np.array_equal(ranking, self._ranking):
+                return [self.ax_map, self.ax_graph]
+            self._ranking = ranking
+            for rank, (text, civ_id) in enumerate(zip(self.leaderboard_texts, ranking)):
+                r, g, b, *_ = self.colors[civ_id]
+                text.set_text(f"#{rank+1} {self.sim.civ_names[civ_id - 2]}")
+                text.get_bbox_patch().set_facecolor((r, g, b, 0.5))
+        return [self.ax_map, self.ax_graph, self.ax_leaderboard]
+
+    def _grow_limits(self, first_frame, frame, top):
+        """Widens the graph axes in big jumps so a full redraw is rarely needed"""
+        x0, x1 = self.ax_graph.get_xlim()
+        _, y1 = self.ax_graph.get_ylim()
+        changed = False
+        if frame > x1 or first_frame > x0 + self.territory.capacity / 2:
+            self.ax_graph.set_xlim(first_frame, max(100, frame * 1.5))
+            changed = True
+        if top > y1:
+            self.ax_graph.set_ylim(0, max(100, top * 1.5))
+            changed = True
+        if changed and self.blit:
+            self.fig.canvas.draw()
+
+    def run(self):
+        self.event_source = self.fig.canvas.new_timer(interval=int(1000 / self.target_fps))
+        self.event_source.add_callback(self.update)
+        self.event_source.start()
+        if self.runner is not None:
+            self.runner.start()
+        plt.tight_layout(rect=[0, 0, 1, 0.96])
+        plt.show(block=True)
@@ -0,0 +1,61 @@
+import numpy as np
+
+NEVER = -2**40  # Frame stamp for "has never happened"; far enough back that every cooldown has run out
+
+class Diplomacy:
+    """War, treaty and cooldown state of every civ as dense arrays indexed by civ id.
+
+    at_war and intensity are symmetric (size x size) matrices, so looking up
+    a pair is plain indexing and a frame's updates are whole-array operations.
+    treaty_frame holds the frame each pair last made peace, cooldown the frame
+    each civ last made peace, and last_war_frame the frame each civ last took
+    or lost a tile in a war. Rows 0 and 1 (water and neutral land) stay unused.
+    """
+
+    def __init__(self, num_civs):
+        size = num_civs + 2
+        self.at_war = np.zeros((size, size), dtype=bool)
+        self.intensity = np.ones((size, size))
+        self.treaty_frame = np.full((size, size), NEVER, dtype=np.int64)
+        self.cooldown = np.full(size, NEVER, dtype=np.int64)
+        self.last_war_frame = np.full(size, NEVER, dtype=np.int64)
+
+    def wars(self):
+        """Every (a, b) pair at war, a < b, in sorted order"""
+        a, b = np.nonzero(self.at_war)
+        upper = a < b
+        return list(zip(a[upper].tolist(), b[upper].tolist()))
+
+    @property
+    def num_wars(self):
+        return int(np.count_nonzero(self.at_war)) // 2
+
+    def is_at_war(self, a, b):
+        return bool(self.at_war[a, b])
+
+    def declare(self, a, b):
+        """Starts wars between the civs a and b (ids or arrays of ids) at intensity 1"""
+        self.at_war[a, b] = self.at_war[b, a] = True
+        self.intensity[a, b] = self.intensity[b, a] = 1.0
+
+    def make_peace(self, a, b, frame):
+        """Ends the wars between a and b, starting their treaties and both sides' cooldowns"""
+        self.at_war[a, b] = self.at_war[b, a] = False
+        self.intensity[a, b] = self.intensity[b, a] = 1.0
+        self.treaty_frame[a, b] = self.treaty_frame[b, a] = frame
+        self.cooldown[a] = self.cooldown[b] = frame
+
+    def forget(self, civ_id):
+        """Drops every war and treaty involving civ_id"""
+        for index in (civ_id, (slice(None), civ_id)):
+            self.at_war[index] = False
+            self.intensity[index] = 1.0
+            self.treaty_frame[index] = NEVER
+
+    def intensify(self, growth, cap=3.0):
+        at_war = np.nonzero(self.at_war)
+        self.intensity[at_war] = np.minimum(self.intensity[at_war] + growth, cap)
+
+    def fronts(self, contacts):
+        """Per civ, how many bordering civs it is at war with"""
+        return np.count_nonzero(self.at_war & (contacts > 0), axis=1)
@@ -0,0 +1,170 @@
+import argparse
+import ast
+import contextlib
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from config import Config
+from events import EventLog
+from simulation import Simulation
+
+FIELDS = ["seed", "overrides", "frames", "finished", "alive", "winner", "annexations", "elapsed"]
+
+def run_seeds(base_seed, count):
+    """Reproducible, independent per-run seeds derived from one base seed"""
+    return [int(seq.generate_state(1)[0]) for seq in np.random.SeedSequence(base_seed).spawn(count)]
+
+def build_runs(sweep, runs_per_setting, base_seed=0):
+    """Every combination of the sweep values, each run with the same list of seeds.
+
+    sweep maps config names to lists of values, e.g. {"MAX_WARS": [3, 5, 7]}.
+    Reusing seeds across settings means settings are compared on identical maps.
+    """
+    names = sorted(sweep)
+    seeds = run_seeds(base_seed, runs_per_setting)
+    runs = []
+    for values in itertools.product(*(sweep[name] for name in names)):
+        overrides = dict(zip(names, values))
+        for seed in seeds:
+            runs.append({"seed": seed, "overrides": overrides})
+    return runs
+
+def run_key(seed, overrides):
+    return json.dumps({"seed": int(seed), "overrides": overrides}, sort_keys=True)
+
+def events_path(events_dir, run):
+    """Per-run event log file, named by seed and a short hash of the overrides"""
+    digest = hashlib.md5(run_key(run["seed"], run["overrides"]).encode()).hexdigest()[:8]
+    return os.path.join(events_dir, f"events_{run['seed']}_{digest}.jsonl")
+
+def run_one(run, max_frames, events_dir=None):
+    """Runs a single simulation to completion; executed inside a pool worker"""
+    seed = run["seed"]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulation(seed, Config(**run["overrides"]))
+        if events_dir:
+            with EventLog(events_path(events_dir, run), mode="w").attach(sim):
+                sim.run_until(lambda s: s.finished, max_frames=max_frames)
+        else:
+            sim.run_until(lambda s: s.finished, max_frames=max_frames)
+    summary = sim.summary()
+    return {
+        "seed": seed,
+        "overrides": json.dumps(run["overrides"], sort_keys=True),
+        "frames": summary["frames"],
+        "finished": int(sim.finished),
+        "alive": summary["alive"],
+        "winner": summary["winner"] or "",
+        "annexations": summary["annexations"],
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+
+def drop_torn_row(path):
+    """Truncates a last row left without its newline by a run killed mid-write"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = end
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                pos += newline + 1
+                break
+        f.truncate(pos)
+
+def completed_keys(path):
+    """Keys of the runs already in path, skipping any row too damaged to parse"""
+    if not os.path.exists(path):
+        return set()
+    keys = set()
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames and reader.fieldnames != FIELDS:
+            raise ValueError(f"{path} has columns {reader.fieldnames}, expected {FIELDS}; write to a new file")
+        for row in reader:
+            try:
+                keys.add(run_key(row["seed"], json.loads(row["overrides"])))
+            except (TypeError, ValueError):
+                continue
+    return keys
+
+def run_ensemble(runs, out_path, max_frames=10000, workers=None, events_dir=None):
+    """Fans runs out over a process pool, appending each result to out_path as it lands.
+
+    Runs already present in out_path are skipped, so an interrupted sweep
+    resumes where it stopped; a row torn by the interruption is dropped first. With events_dir, each run also streams its
+    event log there. Returns the number of runs executed.
+    """
+    drop_torn_row(out_path)
+    done = completed_keys(out_path)
+    pending = [run for run in runs if run_key(run["seed"], run["overrides"]) not in done]
+    if not pending:
+        return 0
+
+    if events_dir:
+        os.makedirs(events_dir, exist_ok=True)
+    write_header = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+    with open(out_path, "a", newline="") as f, Pool(workers or os.cpu_count()) as pool:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if write_header:
+            writer.writeheader()
+        jobs = pool.imap_unordered(_run_one_star, ((run, max_frames, events_dir) for run in pending), chunksize=1)
+        for count, row in enumerate(jobs, 1):
+            writer.writerow(row)
+            f.flush()
+            print(f"[{len(done) + count}/{len(runs)}] seed {row['seed']} {row['overrides']}: "
+                  f"{row['frames']} frames, winner {row['winner'] or '-'}")
+    return len(pending)
+
+def _run_one_star(args):
+    return run_one(*args)
+
+def parse_sweep(assignments):
+    """Turns ["MAX_WARS=3,5", "EXPANSION_ENGINE=classic"] into {"MAX_WARS": [3, 5], ...}"""
+    sweep = {}
+    for assignment in assignments:
+        name, _, values = assignment.partition("=")
+        sweep[name] = [_parse_value(value) for value in values.split(",")]
+    Config(**{name: values[0] for name, values in sweep.items()})  # reject unknown names early
+    return sweep
+
+def _parse_value(text):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run many headless simulations across seeds and config sweeps")
+    parser.add_argument("--runs", type=int, default=100, help="runs (seeds) per sweep setting")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2",
+                        help="config value(s) to sweep; repeat for a grid sweep")
+    parser.add_argument("--frames", type=int, default=10000, help="frame limit per run")
+    parser.add_argument("--base-seed", type=int, default=0, help="seed the per-run seeds are derived from")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="ensemble_results.csv", help="results table; reused to resume")
+    parser.add_argument("--events-dir", metavar="DIR", help="write each run's event log to DIR")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    runs = build_runs(parse_sweep(args.set), args.runs, args.base_seed)
+    run_ensemble(runs, args.out, args.frames, args.workers, args.events_dir)
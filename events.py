@@ -0,0 +1,62 @@
+import json
+
+from config import EVENT_BUFFER_SIZE, TERRITORY_EVERY
+
+class EventLog:
+    """Streams a run's events to an append-only, line-delimited JSON file.
+
+    Each line is one event: "start" (names, seed and config), "war_declared",
+    "peace", "annexation", "eliminated", and "territory" (tile counts by civ id
+    at the end of the frame, every territory_every frames and on the last). Events are buffered
+    and written in batches of buffer_size, so memory stays bounded however
+    long the run. Use attach() to write the header and start observing.
+    """
+
+    def __init__(self, path, buffer_size=EVENT_BUFFER_SIZE, territory_every=TERRITORY_EVERY, mode="a"):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.territory_every = territory_every
+        self._file = open(path, mode)
+        self._buffer = []
+
+    def attach(self, sim):
+        self.write({"frame": sim.frame, "type": "start", "seed": int(sim.seed), "civ_names": sim.civ_names,
+                    "config": sim.config.as_dict()})
+        sim.add_observer(self)
+        return self
+
+    def __call__(self, sim):
+        for event in sim.events:
+            self.write(event)
+        every = self.territory_every
+        if every and (sim.frame % every == 0 or sim.finished):
+            self.write({"frame": sim.frame - 1, "type": "territory", "counts": sim.territory().tolist()})
+
+    def write(self, event):
+        self._buffer.append(json.dumps(event))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_events(path, types=None):
+    """Yields the events in path one at a time, optionally only those whose type is in types"""
+    with open(path) as f:
+        for line in f:
+            event = json.loads(line)
+            if types is None or event["type"] in types:
+                yield event
@@ -0,0 +1,189 @@
+import argparse
+import os
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+from matplotlib import animation
+from matplotlib.artist import Artist
+from matplotlib.figure import Figure
+from PIL import Image
+
+from config import *
+from chunks import ChunkIndex
+from history import HistoryRecorder, OwnershipHistory
+from names import name_to_color
+from simulation import Simulation
+from visualization import MapRenderer, get_color_map
+
+FRAMES_PER_TASK = 100
+VIDEO_BUFFER_BYTES = 2**30              # Rendered video frames allowed in flight between the workers and the writer
+PNG_COMPRESSION = 1                     # zlib level for PNG frames; higher is smaller but much slower
+BACKGROUND = np.array([255, 255, 255])  # The live view draws the map over a white figure
+
+def history_meta(sim):
+    """What export needs to color a history like the live view, for OwnershipHistory.save"""
+    return {"seed": int(sim.seed), "num_civs": sim.num_civs, "civ_names": sim.civ_names,
+            "colors": {name: name_to_color[name] for name in sim.civ_names if name in name_to_color}}
+
+def record_headless(seed, max_frames, history_path=HISTORY_PATH):
+    """Runs a simulation without a display, recording every frame; returns its history"""
+    sim = Simulation(seed)
+    history = OwnershipHistory(sim.ownership.shape, sim.num_civs, path=history_path,
+                                chunk_size=sim.config.CHUNK_SIZE)
+    history.meta = history_meta(sim)
+    sim.add_observer(HistoryRecorder(sim, history))
+    sim.run_until(lambda s: s.finished, max_frames=max_frames)
+    return history
+
+def _frame_ranges(start, stop, step, per_task):
+    """Splits the exported frames into tasks of per_task frames, each a (first, last + 1) range"""
+    frames = range(start, stop, step)
+    return [(frames[i], frames[min(i + per_task, len(frames)) - 1] + 1) for i in range(0, len(frames), per_task)]
+
+def _task(history, first, last):
+    """The grid at first plus what each later frame changed, so a worker can replay [first, last)"""
+    changes = [history[f] if history.is_keyframe(f) else history.delta(f) for f in range(first + 1, last)]
+    return history[first], changes
+
+def _opaque_renderer(meta):
+    renderer = MapRenderer(get_color_map(meta["num_civs"]), meta["civ_names"], meta["colors"])
+    alpha = renderer.palette[..., 3:] / 255
+    renderer.palette[..., :3] = (renderer.palette[..., :3] * alpha + BACKGROUND * (1 - alpha)).round()
+    renderer.palette[..., 3] = 255
+    return renderer
+
+class _FrameArtist(Artist):
+    """Hands a uint8 RGBA frame straight to the renderer, skipping AxesImage's resampling and masking"""
+
+    def __init__(self, frame):
+        super().__init__()
+        self.frame = frame
+
+    def draw(self, renderer):
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, 0, 0, self.frame)
+        gc.restore()
+
+def _render(meta, first, last, step, scale, grid, changes):
+    """Yields (frame, RGBA image) for every step-th frame in [first, last), replayed from grid and changes"""
+    renderer = _opaque_renderer(meta)
+    chunks = ChunkIndex(grid.shape)
+    flat = grid.ravel()
+    dirty = None
+    for frame in range(first, last):
+        if frame > first:
+            change = changes[frame - first - 1]
+            if isinstance(change, tuple):
+                index, values = change
+                flat[index] = values
+                if dirty is not None:
+                    ys, xs = np.divmod(index, grid.shape[1])
+                    dirty.extend(chunks.bounds(np.unique(chunks.ids(ys, xs))))
+            else:
+                # Keyframes carry the whole grid; let the renderer find what changed
+                grid[:] = change
+                dirty = None
+        if (frame - first) % step:
+            continue
+        image = renderer.render(grid, dirty)
+        dirty = []
+        if scale > 1:
+            image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+        yield frame, image
+
+def _write_pngs(args):
+    meta, first, last, step, scale, grid, changes, out_dir = args
+    count = 0
+    for frame, image in _render(meta, first, last, step, scale, grid, changes):
+        Image.fromarray(image[..., :3]).save(os.path.join(out_dir, f"frame_{frame:06d}.png"),
+                                             compress_level=PNG_COMPRESSION)
+        count += 1
+    return count
+
+def _render_images(args):
+    meta, first, last, step, scale, grid, changes = args
+    # Agg draws images bottom row first; the frames are opaque, so only RGB goes back to the writer
+    return [image[::-1, :, :3].copy() for _, image in _render(meta, first, last, step, scale, grid, changes)]
+
+def export(history, out, start=0, stop=None, step=1, scale=1, fps=30, workers=None, writer=None,
+           frames_per_task=FRAMES_PER_TASK, buffer_bytes=VIDEO_BUFFER_BYTES):
+    """Renders frames [start, stop) of history, every step-th one, to a video file or a PNG folder.
+
+    An out path with an extension is a video written through a Matplotlib
+    movie writer (ffmpeg by default, pillow for .gif); otherwise out is a
+    directory that receives frame_NNNNNN.png files. Frames are rendered
+    straight from the ownership arrays, and a process pool takes a range of
+    frames per task, each replaying only its own range from the history.
+    Video frames travel back to the writer, so for video the tasks shrink
+    until at most buffer_bytes of rendered frames are in flight at once.
+    Returns the number of frames written.
+    """
+    stop = len(history) if stop is None else min(stop, len(history))
+    workers = workers or os.cpu_count()
+    meta = history.meta
+    height, width = history.shape[0] * scale, history.shape[1] * scale
+
+    video = bool(os.path.splitext(out)[1])
+    if video:
+        # One task per worker plus the one being written
+        window = workers + 1
+        frames_per_task = max(1, min(frames_per_task, buffer_bytes // (window * height * width * 3)))
+    else:
+        window = workers * 2
+        os.makedirs(out, exist_ok=True)
+    ranges = _frame_ranges(start, stop, step, frames_per_task)
+    tasks = ((meta, first, last, step, scale, *_task(history, first, last)) for first, last in ranges)
+    if not video:
+        tasks = (task + (out,) for task in tasks)
+    work = _render_images if video else _write_pngs
+
+    with Pool(workers) as pool:
+        results = _ordered(pool, work, tasks, window)
+        if not video:
+            return sum(results)
+
+        # One figure exactly the size of the frames; only the RGB of the frame it draws changes
+        fig = Figure(figsize=(width / 100, height / 100), dpi=100)
+        artist = fig.add_artist(_FrameArtist(np.full((height, width, 4), 255, dtype=np.uint8)))
+        movie = animation.writers[writer or ("pillow" if out.lower().endswith(".gif") else "ffmpeg")](fps=fps)
+        count = 0
+        with movie.saving(fig, out, dpi=100):
+            for images in results:
+                for frame in images:
+                    artist.frame[..., :3] = frame
+                    movie.grab_frame()
+                    count += 1
+        return count
+
+def _ordered(pool, fn, tasks, window):
+    """Results of fn over tasks, in order, with at most window tasks queued or unread at once"""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(fn, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a recorded or headless run to a video or PNG frames")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--history", metavar="PATH", help="history saved with --save-history")
+    source.add_argument("--seed", type=int, default=SEED, help="run seed for a fresh headless run")
+    parser.add_argument("--frames", type=int, default=10000, help="frame limit for a fresh headless run")
+    parser.add_argument("--out", required=True, help="video file (.mp4, .gif, ...) or a folder for PNG frames")
+    parser.add_argument("--start", type=int, default=0, help="first frame to export")
+    parser.add_argument("--stop", type=int, default=None, help="frame to stop before (default: the last)")
+    parser.add_argument("--step", type=int, default=1, help="export every Nth frame")
+    parser.add_argument("--scale", type=int, default=1, help="pixels per map cell")
+    parser.add_argument("--fps", type=int, default=30, help="video frame rate")
+    parser.add_argument("--writer", default=None, help="Matplotlib movie writer (default: ffmpeg, pillow for .gif)")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: all cores)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    history = OwnershipHistory.load(args.history) if args.history else record_headless(args.seed, args.frames)
+    count = export(history, args.out, args.start, args.stop, args.step, args.scale, args.fps, args.workers, args.writer)
+    print(f"Wrote {count} frames to {args.out}")
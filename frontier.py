@@ -0,0 +1,114 @@
+import numpy as np
+
+from adjacency import CivAdjacency
+from chunks import ChunkIndex
+from config import CHUNK_SIZE
+from connectivity import Connectivity
+
+class FrontierIndex:
+    """Per-civ frontier cells and tile counts, patched from the cells that change each frame.
+
+    A frontier cell is a civ tile with at least one neighbor that is neutral land
+    or another civ (same rule as utils.get_frontier_cells). Cells are stored as
+    flat indices into a water-padded copy of the grid so neighbor lookups never
+    need bounds checks; self.padded always mirrors the current grid. Border
+    lengths between civs are kept alongside in self.adjacency, the
+    disconnected-territory cache in self.connectivity, and per-chunk change
+    stamps in self.chunks.
+    """
+
+    def __init__(self, ownership, num_civs, chunk_size=CHUNK_SIZE):
+        self.shape = ownership.shape
+        self.chunk_size = chunk_size
+        self._row = ownership.shape[1] + 2
+        self._offsets = np.array([-self._row, self._row, -1, 1])
+        self._cells = {civ_id: set() for civ_id in range(2, num_civs + 2)}
+        self.num_civs = num_civs
+        self.rebuild(ownership)
+
+    def rebuild(self, ownership):
+        """Recompute everything from scratch (O(grid), only needed after external edits)"""
+        self.padded = np.pad(ownership, 1, constant_values=0)
+        self._held = np.zeros(self.padded.size, dtype=ownership.dtype)
+        self.sizes = np.bincount(ownership.ravel(), minlength=self.num_civs + 2)
+        self.adjacency = CivAdjacency(ownership, self.num_civs)
+        self.connectivity = Connectivity(ownership)
+        self.chunks = ChunkIndex(self.shape, self.chunk_size)
+        for cells in self._cells.values():
+            cells.clear()
+        self._refresh(np.flatnonzero(self.padded >= 2))
+
+    def update(self, ownership, ys=None, xs=None):
+        """Apply the cells (ys, xs) that now hold new owners in ownership.
+
+        Only the changed cells and their neighbors are re-examined. Without
+        coordinates the changes are found by diffing against the stored grid.
+        """
+        if ys is None:
+            ys, xs = np.nonzero(self.padded[1:-1, 1:-1] != ownership)
+        idx = np.unique((np.asarray(ys) + 1) * self._row + np.asarray(xs) + 1)
+        if len(idx) == 0:
+            return
+        flat = self.padded.ravel()
+        old_owners = flat[idx].copy()
+        np.subtract.at(self.sizes, old_owners, 1)
+        self.adjacency.count_edges(flat, idx, self._offsets, -1)
+        flat[idx] = ownership.ravel()[self._to_grid(idx)]
+        ys, xs = idx // self._row - 1, idx % self._row - 1
+        self.connectivity.note_changes(ys, xs, old_owners, flat[idx], self.padded[1:-1, 1:-1])
+        self.chunks.mark(ys, xs)
+        np.add.at(self.sizes, flat[idx], 1)
+        self.adjacency.count_edges(flat, idx, self._offsets, 1)
+        self._refresh(np.unique(np.concatenate([idx, (idx[:, None] + self._offsets).ravel()])))
+
+    def _to_grid(self, idx):
+        return (idx // self._row - 1) * (self._row - 2) + idx % self._row - 1
+
+    def _refresh(self, idx):
+        # Padding cells are water and can never be frontier
+        idx = idx[(idx >= self._row) & (idx < self.padded.size - self._row)]
+        flat = self.padded.ravel()
+        owner = flat[idx]
+        neighbors = flat[idx[:, None] + self._offsets]
+        is_frontier = (owner >= 2) & ((neighbors != owner[:, None]) & (neighbors != 0)).any(axis=1)
+        held = self._held[idx]
+        now_held = np.where(is_frontier, owner, 0)
+        changed = held != now_held
+        for i, old, new in zip(idx[changed].tolist(), held[changed].tolist(), now_held[changed].tolist()):
+            if old:
+                self._cells[old].discard(i)
+            if new:
+                self._cells.setdefault(new, set()).add(i)
+        self._held[idx] = now_held
+
+    def alive(self):
+        return [civ_id for civ_id in self._cells if self.sizes[civ_id] > 0]
+
+    def size(self, civ_id):
+        return int(self.sizes[civ_id])
+
+    def cells(self, civ_id):
+        """Frontier cells of civ_id as (y, x) tuples, in raster order"""
+        return [(i // self._row - 1, i % self._row - 1) for i in sorted(self._cells.get(civ_id, ()))]
+
+    def coords(self):
+        """(ys, xs) arrays of every civ's frontier cells, in grid coordinates.
+
+        Cells are grouped by civ and in raster order within each civ, so the
+        order depends only on the grid and not on how the sets were built up.
+        """
+        idx = np.concatenate([np.sort(np.fromiter(cells, dtype=np.int64, count=len(cells)))
+                              for cells in self._cells.values()] or [np.zeros(0, dtype=np.int64)])
+        return idx // self._row - 1, idx % self._row - 1
+
+    def disconnected(self):
+        """Mask of civ tiles cut off from their civ's largest region"""
+        return self.connectivity.disconnected(self.padded[1:-1, 1:-1])
+
+    def neighbors(self, civ_id):
+        """Other civs sharing a border with civ_id"""
+        return self.adjacency.neighbors(civ_id)
+
+    def occupiers(self, civ_id):
+        """Border contact counts {other_civ: edges} around civ_id's territory"""
+        return self.adjacency.occupiers(civ_id)
@@ -0,0 +1,228 @@
+import json
+
+import numpy as np
+
+from chunks import pack_chunks, unpack_chunks
+from config import CHUNK_SIZE, HISTORY_KEYFRAME_INTERVAL
+
+class _MemoryStore:
+    """Append-only byte storage kept in RAM"""
+
+    def __init__(self):
+        self._chunks = []
+        self.nbytes = 0
+
+    def append(self, array):
+        self._chunks.append(np.ascontiguousarray(array))
+        self.nbytes += array.nbytes
+        return len(self._chunks) - 1
+
+    def read(self, ref, dtype, count):
+        return self._chunks[ref]
+
+    def close(self):
+        self._chunks.clear()
+
+class _FileStore:
+    """Append-only byte storage spilled to a file and read back through a memory map"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w+b")
+        self._map = None
+        self.nbytes = 0
+
+    def append(self, array):
+        offset = self.nbytes
+        self._file.write(np.ascontiguousarray(array).tobytes())
+        self.nbytes += array.nbytes
+        return offset
+
+    def read(self, ref, dtype, count):
+        end = ref + count * np.dtype(dtype).itemsize
+        if self._map is None or len(self._map) < end:
+            self._file.flush()
+            self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        return self._map[ref:end].view(dtype)
+
+    def close(self):
+        self._map = None
+        self._file.close()
+
+class OwnershipHistory:
+    """Every recorded ownership frame, stored as periodic keyframes plus sparse deltas.
+
+    Cells are stored in the smallest unsigned dtype that fits the civ ids, and a
+    delta frame only costs the cells that changed. Keyframes are chunk-packed,
+    so water and settled interior cost one value per chunk. Any frame can be
+    rebuilt from the keyframe at or before it, so seeking is bounded by
+    keyframe_interval. Pass path to keep the data in a memory-mapped file
+    instead of RAM. save() writes the whole history, with any metadata, to
+    one file that load() reads back in another session.
+    """
+
+    def __init__(self, shape, num_civs, keyframe_interval=HISTORY_KEYFRAME_INTERVAL, path=None, chunk_size=CHUNK_SIZE):
+        self.shape = tuple(shape)
+        self.dtype = np.min_scalar_type(num_civs + 1)
+        self.keyframe_interval = keyframe_interval
+        self.chunk_size = chunk_size
+        self.meta = {}
+        self._store = _FileStore(path) if path else _MemoryStore()
+        self._frames = []  # per frame: (values ref, mixed ref, cells ref, counts) or (index ref, value ref, count)
+        self._last = None
+        self._cache = None  # (frame, grid) of the most recent lookup, for sequential replay
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def nbytes(self):
+        return self._store.nbytes
+
+    def append(self, ownership, regions=None):
+        """Records the next frame.
+
+        regions optionally lists the (y0, y1, x0, x1) rectangles that may have
+        changed since the previous frame (e.g. from ChunkIndex.bounds); the rest
+        of the grid is then not compared at all.
+        """
+        if len(self._frames) % self.keyframe_interval == 0:
+            grid = ownership.astype(self.dtype, copy=False)
+            values, mixed, cells = pack_chunks(grid, self.chunk_size)
+            self._frames.append((self._store.append(values), self._store.append(mixed.view(np.uint8)),
+                                 self._store.append(cells), (len(values), len(cells))))
+            self._last = grid.copy()
+            return
+
+        if regions is None:
+            regions = [(0, self.shape[0], 0, self.shape[1])]
+        changed, values = [], []
+        width = self.shape[1]
+        for y0, y1, x0, x1 in regions:
+            block = ownership[y0:y1, x0:x1]
+            ys, xs = np.nonzero(block != self._last[y0:y1, x0:x1])
+            if len(ys):
+                changed.append((ys + y0) * width + xs + x0)
+                values.append(block[ys, xs].astype(self.dtype))
+                self._last[ys + y0, xs + x0] = values[-1]
+        if changed:
+            changed, values = np.concatenate(changed).astype(np.int32), np.concatenate(values)
+            self._frames.append((self._store.append(changed), self._store.append(values), len(changed)))
+        else:
+            self._frames.append((None, None, 0))
+
+    def __getitem__(self, frame):
+        if frame < 0:
+            frame += len(self._frames)
+        if not 0 <= frame < len(self._frames):
+            raise IndexError(f"frame {frame} not recorded")
+
+        keyframe = frame - frame % self.keyframe_interval
+        if self._cache is not None and keyframe <= self._cache[0] <= frame:
+            start, grid = self._cache[0] + 1, self._cache[1].copy()
+        else:
+            values_ref, mixed_ref, cells_ref, (chunks, count) = self._frames[keyframe]
+            values = self._store.read(values_ref, self.dtype, chunks)
+            mixed = self._store.read(mixed_ref, np.uint8, chunks).view(bool)
+            cells = self._store.read(cells_ref, self.dtype, count)
+            start, grid = keyframe + 1, unpack_chunks(self.shape, values, mixed, cells, self.chunk_size).ravel()
+
+        for f in range(start, frame + 1):
+            index_ref, value_ref, count = self._frames[f]
+            if count:
+                grid[self._store.read(index_ref, np.int32, count)] = self._store.read(value_ref, self.dtype, count)
+
+        self._cache = (frame, grid)
+        return grid.reshape(self.shape).copy()
+
+    def __iter__(self):
+        for frame in range(len(self._frames)):
+            yield self[frame]
+
+    def is_keyframe(self, frame):
+        return frame % self.keyframe_interval == 0
+
+    def delta(self, frame):
+        """(flat indices, values) of the cells that changed in a non-keyframe frame"""
+        index_ref, value_ref, count = self._frames[frame]
+        if not count:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=self.dtype)
+        return self._store.read(index_ref, np.int32, count), self._store.read(value_ref, self.dtype, count)
+
+    def save(self, path, **meta):
+        """Writes every frame to one .npz file, with meta (plus self.meta) stored as JSON"""
+        keys = {"values": [], "mixed": [], "cells": []}
+        deltas = {"index": [], "value": []}
+        counts = np.zeros(len(self._frames), dtype=np.int64)
+        chunks = 0
+        for frame in range(len(self._frames)):
+            if self.is_keyframe(frame):
+                values_ref, mixed_ref, cells_ref, (chunks, count) = self._frames[frame]
+                keys["values"].append(self._store.read(values_ref, self.dtype, chunks))
+                keys["mixed"].append(self._store.read(mixed_ref, np.uint8, chunks))
+                keys["cells"].append(self._store.read(cells_ref, self.dtype, count))
+            else:
+                index, value = self.delta(frame)
+                count = len(index)
+                deltas["index"].append(index)
+                deltas["value"].append(value)
+            counts[frame] = count
+
+        header = {"shape": self.shape, "dtype": self.dtype.str, "keyframe_interval": self.keyframe_interval,
+                  "chunk_size": self.chunk_size, "chunks": chunks, "meta": {**self.meta, **meta}}
+        np.savez(path, counts=counts,
+                 key_values=_concat(keys["values"], self.dtype), key_mixed=_concat(keys["mixed"], np.uint8),
+                 key_cells=_concat(keys["cells"], self.dtype), delta_index=_concat(deltas["index"], np.int32),
+                 delta_value=_concat(deltas["value"], self.dtype),
+                 header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        """An in-memory OwnershipHistory holding every frame written by save(); .meta holds its metadata"""
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes())
+            arrays = {name: data[name] for name in data.files if name != "header"}
+        history = cls(header["shape"], 0, header["keyframe_interval"], chunk_size=header["chunk_size"])
+        history.dtype = np.dtype(header["dtype"])
+        history.meta = header["meta"]
+
+        store, chunks = history._store, header["chunks"]
+        key = cell = delta = 0
+        for frame, count in enumerate(arrays["counts"].tolist()):
+            if history.is_keyframe(frame):
+                history._frames.append((store.append(arrays["key_values"][key * chunks:(key + 1) * chunks]),
+                                        store.append(arrays["key_mixed"][key * chunks:(key + 1) * chunks]),
+                                        store.append(arrays["key_cells"][cell:cell + count]), (chunks, count)))
+                key, cell = key + 1, cell + count
+            elif count:
+                history._frames.append((store.append(arrays["delta_index"][delta:delta + count]),
+                                        store.append(arrays["delta_value"][delta:delta + count]), count))
+                delta += count
+            else:
+                history._frames.append((None, None, 0))
+        if history._frames:
+            history._last = history[-1]
+        return history
+
+    def close(self):
+        self._store.close()
+
+def _concat(arrays, dtype):
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+class HistoryRecorder:
+    """Simulation observer that records every frame, starting with the current one, into history.
+
+    Only the chunks changed since the previous frame are compared.
+    """
+
+    def __init__(self, sim, history):
+        self.history = history
+        self._version = sim.frontier.chunks.version
+        history.append(sim.ownership)
+
+    def __call__(self, sim):
+        chunks = sim.frontier.chunks
+        regions = chunks.bounds(chunks.changed_since(self._version))
+        self._version = chunks.version
+        self.history.append(sim.ownership, regions)
@@ -0,0 +1,29 @@
+import numpy as np
+
+# --- Name generation ---
+civ_prefixes = ["Trerthustan", "Jeerbia", "Trauntium", "Mutuastan", "Myrr", "Citan", "Tyrenia", "Nostara", "Yumker", "Branth"]
+civ_suffixes = ["Kingdom", "Union", "Empire", "Federation", "Dominion", "Confederacy", "Alliance", "Realm"]
+name_to_color = {"The Birmingham Barony": [1.0, 0.2, 0.2, 0.5]}  # Hand-picked overrides of the palette color
+
+def generate_civ_name(rng=np.random):
+    if rng.random() < 0.01:
+        print("BIRMINGHAM!!!")
+        return "The Birmingham Barony"
+    return f"The {rng.choice(civ_prefixes)} {rng.choice(civ_suffixes)}"
+
+def generate_unique_civ_names(num_names, rng=np.random):
+    civ_names = []
+    seen = {}
+    name_pool = len(civ_prefixes) * len(civ_suffixes) + 1
+    while len(civ_names) < num_names:
+        name = generate_civ_name(rng)
+        if name in seen:
+            # Only number repeats once every plain name is taken
+            if len(seen) < name_pool:
+                continue
+            seen[name] += 1
+            name = f"{name} {seen[name]}"
+        else:
+            seen[name] = 1
+        civ_names.append(name)
+    return civ_names
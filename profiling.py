@@ -0,0 +1,64 @@
+import time
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_PHASE = _NoPhase()
+
+class PhaseTimer:
+    """Accumulates wall time per named phase; cheap enough to leave wired in.
+
+    Use as `with timer.phase("expand_and_fight"): ...`. While disabled the
+    context manager is a shared no-op, so it can be toggled at runtime.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.totals = {}
+        self.counts = {}
+
+    def phase(self, name):
+        return _Phase(self, name) if self.enabled else _NO_PHASE
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def summary(self):
+        """{phase: {"total": s, "calls": n, "mean": s}} sorted by total time"""
+        return {name: {"total": total, "calls": self.counts[name], "mean": total / self.counts[name]}
+                for name, total in sorted(self.totals.items(), key=lambda item: -item[1])}
+
+    def report(self):
+        grand_total = sum(self.totals.values()) or 1.0
+        lines = [f"{'phase':<24}{'total s':>10}{'calls':>8}{'mean ms':>10}{'share':>8}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<24}{stats['total']:>10.3f}{stats['calls']:>8}"
+                         f"{stats['mean'] * 1000:>10.3f}{stats['total'] / grand_total:>8.1%}")
+        return "\n".join(lines)
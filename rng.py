@@ -0,0 +1,29 @@
+import numpy as np
+
+STREAMS = ("terrain", "placement", "names", "expansion", "diplomacy")
+
+def new_seed():
+    """A fresh random run seed, drawn from OS entropy"""
+    return int(np.random.default_rng().integers(2**63))
+
+class RandomStreams:
+    """All of one run's randomness, as an independent numpy Generator per subsystem.
+
+    Every stream is spawned from the run seed, so each subsystem draws the same
+    numbers whatever the others do: changing the expansion engine leaves the
+    map, starting positions and names alone, and nothing depends on global RNG
+    state, other simulations in the process, or how runs are spread over workers.
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+        for name, child in zip(STREAMS, np.random.SeedSequence(seed).spawn(len(STREAMS))):
+            setattr(self, name, np.random.default_rng(child))
+
+    def state(self):
+        """JSON-serialisable state of every stream"""
+        return {name: getattr(self, name).bit_generator.state for name in STREAMS}
+
+    def set_state(self, state):
+        for name in STREAMS:
+            getattr(self, name).bit_generator.state = state[name]
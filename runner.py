@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import namedtuple
+
+Snapshot = namedtuple("Snapshot", ["frame", "ownership", "territory", "finished", "regions"])
+
+class BackgroundRunner(threading.Thread):
+    """Steps a Simulation on a worker thread and publishes snapshots for a display.
+
+    The grid is only copied when the consumer has taken the previous snapshot,
+    so a display copies it at most once per frame it shows, however fast the
+    simulation runs. Each snapshot lists the chunk rectangles that changed since
+    the previous one. max_fps caps simulated frames per second (None runs flat out).
+    """
+
+    def __init__(self, sim, max_fps=None):
+        super().__init__(name="simulation", daemon=True)
+        self.sim = sim
+        self.max_fps = max_fps
+        self.fps = 0.0
+        self.error = None
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._wanted = True
+        self._pending = []
+        self._version = None
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._stopped = threading.Event()
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def toggle_pause(self):
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+
+    def faster(self):
+        if self.max_fps is not None:
+            self.max_fps *= 2
+
+    def slower(self):
+        self.max_fps = max((self.max_fps or self.fps) / 2, 1.0)
+
+    def call_soon(self, fn):
+        """Runs fn(sim) on the worker between two frames, where the state is consistent"""
+        with self._lock:
+            self._pending.append(fn)
+
+    def _run_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for fn in pending:
+            fn(self.sim)
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._resumed.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def run(self):
+        sim = self.sim
+        try:
+            self._publish()
+            while not self._stopped.is_set() and not sim.finished:
+                self._run_pending()
+                if not self._resumed.wait(0.1):
+                    continue
+                start = time.perf_counter()
+                sim.step()
+                if self._wanted:
+                    self._publish()
+                if self.max_fps:
+                    time.sleep(max(1.0 / self.max_fps - (time.perf_counter() - start), 0.0))
+                elapsed = time.perf_counter() - start
+                self.fps = 0.9 * self.fps + 0.1 / max(elapsed, 1e-9)
+            self._run_pending()
+            self._publish()
+        except Exception as e:
+            self.error = e
+            raise
+
+    def _publish(self):
+        sim = self.sim
+        chunks = sim.frontier.chunks
+        regions = chunks.bounds(chunks.changed_since(self._version)) if self._version is not None else None
+        self._version = chunks.version
+        snapshot = Snapshot(sim.frame, sim.ownership.copy(), sim.territory(), sim.finished, regions)
+        with self._lock:
+            if self._snapshot is not None:
+                # The previous snapshot was never taken, so its changes carry over
+                previous = self._snapshot.regions
+                snapshot = snapshot._replace(regions=None if previous is None or regions is None else previous + regions)
+            self._snapshot = snapshot
+            self._wanted = False
+
+    def latest(self):
+        """The newest snapshot not yet taken, or None when nothing new was published"""
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+            self._wanted = True
+        return snapshot
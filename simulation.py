@@ -0,0 +1,142 @@
+import numpy as np
+
+from config import *
+from terrain import generate_terrain, generate_heightmap
+from frontier import FrontierIndex
+from names import generate_unique_civ_names
+from civ_logic import *
+from diplomacy import Diplomacy
+from profiling import PhaseTimer
+from rng import RandomStreams, new_seed
+
+def ownership_dtype(num_civs):
+    """Smallest signed integer type (at least int16) that holds every civ id"""
+    return np.promote_types(np.int16, np.min_scalar_type(-(num_civs + 2)))
+
+class Simulation:
+    """Owns the full model state and advances it without any display.
+
+    All randomness comes from self.rng, the run seed's RandomStreams, so the
+    same seed always plays out the same way. Observers are callables taking
+    the simulation; they run after every frame and can read that frame's war,
+    peace, annexation and elimination records from self.events. self.timer
+    records per-phase wall time whenever it is enabled.
+    """
+
+    def __init__(self, seed=SEED, config=DEFAULT_CONFIG):
+        if seed is None:
+            seed = new_seed()
+        print("Using seed:", seed)
+        rng = RandomStreams(seed)
+        terrain, _ = generate_terrain(seed, config)
+        ownership = terrain.astype(ownership_dtype(config.NUM_CIVS))
+        land_indices = np.argwhere(terrain)
+        starts = rng.placement.choice(len(land_indices), min(config.NUM_CIVS, len(land_indices)), replace=False)
+        for i, (y, x) in enumerate(land_indices[starts]):
+            ownership[y, x] = i + 2
+
+        self._setup(config, seed, ownership, rng)
+        self.civ_names = generate_unique_civ_names(self.num_civs, rng.names)
+
+    def _setup(self, config, seed, ownership, rng=None):
+        self.config = config
+        self.num_civs = num_civs = config.NUM_CIVS
+        self.expand = EXPANSION_ENGINES[config.EXPANSION_ENGINE]
+        self.seed = seed
+        self.rng = rng or RandomStreams(seed)
+        self._heightmap = None
+        self.terrain = ownership > 0
+        self.ownership = ownership
+
+        self.frame = 0
+        self.diplomacy = Diplomacy(num_civs)
+        self.last_expansion_frame = np.zeros(num_civs + 2, dtype=int)
+        self.annexation_logs = []
+        self.annexations = 0
+        self.events = []
+        self.civ_names = []
+        self.frontier = FrontierIndex(self.ownership, num_civs, config.CHUNK_SIZE)
+        self.observers = []
+        self.timer = PhaseTimer()
+
+    @classmethod
+    def from_state(cls, config, seed, ownership, civ_names):
+        """A simulation resumed from a saved grid; the caller restores the remaining state, self.rng included"""
+        sim = cls.__new__(cls)
+        sim._setup(config, seed, ownership)
+        sim.civ_names = list(civ_names)
+        return sim
+
+    @property
+    def heightmap(self):
+        # Only kept once asked for; on big maps it is the largest array by far
+        if self._heightmap is None:
+            self._heightmap = generate_heightmap(self.seed, self.config)
+        return self._heightmap
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def step(self, n=1):
+        cfg = self.config
+        timer = self.timer
+        for _ in range(n):
+            self.events = events = []
+            alive = self.frontier.alive()
+            with timer.phase("increase_war_intensity"):
+                increase_war_intensity(self.diplomacy, cfg=cfg)
+            with timer.phase("expand_and_fight"):
+                ownership, expanded = self.expand(
+                    self.ownership, self.num_civs, cfg.BASE_EXPANSION_CHANCE,
+                    self.diplomacy, self.frame, self.last_expansion_frame, frontier=self.frontier, cfg=cfg,
+                    rng=self.rng.expansion)
+                if ownership is not self.ownership:
+                    self.ownership[:] = ownership
+                self.last_expansion_frame[expanded] = self.frame
+            with timer.phase("declare_war_if_idle"):
+                declare_war_if_idle(self.frame, self.ownership, self.diplomacy, frontier=self.frontier, cfg=cfg, events=events)
+            with timer.phase("maybe_end_wars"):
+                maybe_end_wars(self.frame, self.diplomacy, cfg=cfg, events=events, rng=self.rng.diplomacy)
+            with timer.phase("check_for_annexations"):
+                annexed = check_for_annexations(self.ownership, self.diplomacy, self.civ_names, self.frame,
+                                                self.annexation_logs, frontier=self.frontier, cfg=cfg, events=events,
+                                                rng=self.rng.diplomacy)
+            self.annexations += len(annexed)
+            for civ_id in alive:
+                if self.frontier.sizes[civ_id] == 0:
+                    events.append({"frame": self.frame, "type": "eliminated", "civ": int(civ_id)})
+            self.frame += 1
+            for observer in self.observers:
+                observer(self)
+
+    def run_until(self, condition, max_frames=None):
+        """Steps until condition(self) holds or max_frames have run; returns frames stepped"""
+        start = self.frame
+        while not condition(self):
+            if max_frames is not None and self.frame - start >= max_frames:
+                break
+            self.step()
+        return self.frame - start
+
+    def territory(self):
+        """Tile counts indexed by civ id (0 and 1 are water and neutral land)"""
+        return self.frontier.sizes.copy()
+
+    def alive_civs(self):
+        return self.frontier.alive()
+
+    @property
+    def finished(self):
+        return len(self.alive_civs()) <= 1
+
+    def summary(self):
+        territory = self.territory()
+        ranking = sorted(self.alive_civs(), key=lambda civ_id: -territory[civ_id])
+        return {
+            "seed": self.seed,
+            "frames": self.frame,
+            "alive": len(ranking),
+            "annexations": self.annexations,
+            "winner": self.civ_names[ranking[0] - 2] if len(ranking) == 1 else None,
+            "leaderboard": [(self.civ_names[civ_id - 2], int(territory[civ_id])) for civ_id in ranking],
+        }
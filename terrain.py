@@ -1,20 +1,128 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from noise import pnoise2
 from config import *
+from rng import RandomStreams, new_seed
 
-def generate_terrain(seed=None):
-    if seed is None:
-        seed = np.random.randint(0, 100)
-    print("Using seed:", seed)
+# Ken Perlin's permutation, as used by the `noise` package's pnoise2
+_PERMUTATION = [
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140, 36, 103, 30, 69,
+    142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247, 120, 234, 75, 0, 26, 197, 62, 94, 252, 219,
+    203, 117, 35, 11, 32, 57, 177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175,
+    74, 165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122, 60, 211, 133, 230,
+    220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161, 1, 216, 80, 73, 209, 76,
+    132, 187, 208, 89, 18, 169, 200, 196, 135, 130, 116, 188, 159, 86, 164, 100, 109, 198, 173, 186,
+    3, 64, 52, 217, 226, 250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207, 206, 59,
+    227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213, 119, 248, 152, 2, 44, 154, 163, 70,
+    221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178,
+    185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144, 12, 191, 179, 162, 241, 81,
+    51, 145, 235, 249, 14, 239, 107, 49, 192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115,
+    121, 50, 45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72, 243, 141, 128, 195,
+    78, 66, 215, 61, 156, 180
+]
+PERM = np.array(_PERMUTATION, dtype=np.int32)
+GRAD_X = np.array([1, -1, 1, -1, 1, -1, 1, -1, 0, 0, 0, 0, 1, -1, 0, 0], dtype=np.float32)
+GRAD_Y = np.array([1, 1, -1, -1, 0, 0, 0, 0, 1, -1, 1, -1, 0, 0, -1, 1], dtype=np.float32)
+
+CACHE_VERSION = 3
+ROW_BAND = 256                     # Rows computed at once, bounds temporary memory on huge maps
+
+def _lerp(t, a, b):
+    return a + t * (b - a)
+
+def _grad(h, x, y):
+    h = h & 15
+    return x * GRAD_X[h] + y * GRAD_Y[h]
+
+def perlin2(x, y, repeatx, repeaty, perm=PERM):
+    """Single octave of improved Perlin noise over float32 coordinate arrays, hashed through perm"""
+    i = np.floor(np.fmod(x, repeatx)).astype(np.int32)
+    j = np.floor(np.fmod(y, repeaty)).astype(np.int32)
+    ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int32)
+    jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int32)
+    i, j, ii, jj = i & 255, j & 255, ii & 255, jj & 255
+
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    fx = x * x * x * (x * (x * np.float32(6) - np.float32(15)) + np.float32(10))
+    fy = y * y * y * (y * (y * np.float32(6) - np.float32(15)) + np.float32(10))
+
+    # Lookups wrap with & 255, which is what pnoise2's doubled table does at its default base
+    a, b = perm[i], perm[ii]
+    one = np.float32(1)
+    return _lerp(fy, _lerp(fx, _grad(perm[perm[(a + j) & 255]], x, y), _grad(perm[perm[(b + j) & 255]], x - one, y)),
+                     _lerp(fx, _grad(perm[perm[(a + jj) & 255]], x, y - one),
+                           _grad(perm[perm[(b + jj) & 255]], x - one, y - one)))
 
-    x = np.linspace(0, GRID_SIZE / SCALE, GRID_SIZE, endpoint=False)
-    y = np.linspace(0, GRID_SIZE / SCALE, GRID_SIZE, endpoint=False)
-    xx, yy = np.meshgrid(x, y)
+def fractal_noise(x, y, octaves, persistence, lacunarity, perm=PERM, repeat=1024):
+    """Sum of octaves, normalized by total amplitude (same as pnoise2 with octaves > 1 for the default perm)"""
+    freq, amp, max_amp = np.float32(1), np.float32(1), np.float32(0)
+    total = np.zeros(np.broadcast(x, y).shape, dtype=np.float32)
+    for _ in range(octaves):
+        total += perlin2(x * freq, y * freq, np.float32(repeat) * freq, np.float32(repeat) * freq, perm) * amp
+        max_amp += amp
+        freq *= np.float32(lacunarity)
+        amp *= np.float32(persistence)
+    return total / max_amp
 
-    terrain = np.vectorize(lambda a, b: pnoise2(
-        a, b, octaves=OCTAVES, persistence=PERSISTENCE,
-        lacunarity=LACUNARITY, repeatx=1024, repeaty=1024, base=seed
-    ))(xx, yy)
+def _noise_rows(args):
+    """Raw noise for rows [start, stop) of the map; runs in a worker when tiled"""
+    start, stop, perm, cfg = args
+    coords = np.linspace(0, cfg.GRID_SIZE / cfg.SCALE, cfg.GRID_SIZE, endpoint=False).astype(np.float32)
+    return fractal_noise(coords[None, :], coords[start:stop, None],
+                         cfg.OCTAVES, cfg.PERSISTENCE, cfg.LACUNARITY, perm)
+
+def _cache_path(seed, cfg):
+    params = {"version": CACHE_VERSION, "seed": seed, "size": cfg.GRID_SIZE, "scale": cfg.SCALE,
+              "octaves": cfg.OCTAVES, "persistence": cfg.PERSISTENCE, "lacunarity": cfg.LACUNARITY}
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:24]
+    return os.path.join(cfg.TERRAIN_CACHE_DIR, f"heightmap_{key}.npy")
+
+def generate_heightmap(seed, cfg=DEFAULT_CONFIG, workers=None):
+    """Continuous heightmap of a run normalized to [0, 1], loaded from the terrain cache when possible.
+
+    seed is the run seed; the noise permutation is drawn from its terrain
+    stream, so every seed has its own map. The cache is keyed on the seed and
+    noise parameters only, so changing LAND_THRESHOLD reuses the cached map.
+    With workers > 1, row bands are computed in separate processes.
+    """
+    path = _cache_path(seed, cfg) if cfg.TERRAIN_CACHE_DIR else None
+    if path and os.path.exists(path):
+        return np.load(path)
+
+    workers = workers or cfg.TERRAIN_WORKERS
+    perm = terrain_permutation(RandomStreams(seed).terrain)
+    bands = [(start, min(start + ROW_BAND, cfg.GRID_SIZE), perm, cfg)
+             for start in range(0, cfg.GRID_SIZE, ROW_BAND)]
+    if workers > 1 and len(bands) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            terrain = np.vstack(list(pool.map(_noise_rows, bands)))
+    else:
+        terrain = np.vstack([_noise_rows(band) for band in bands])
+
+    terrain = terrain.astype(np.float64)
+    heightmap = (terrain - terrain.min()) / (terrain.max() - terrain.min())
+    if path:
+        os.makedirs(cfg.TERRAIN_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, heightmap)
+        os.replace(tmp_path, path)
+    return heightmap
+
+def terrain_permutation(rng):
+    """The noise hash table for a run, a shuffle of 0-255 drawn from its terrain stream"""
+    return rng.permutation(256).astype(np.int32)
+
+def generate_terrain(seed=None, cfg=DEFAULT_CONFIG, return_heightmap=False):
+    if seed is None:
+        seed = new_seed()
 
-    terrain_norm = (terrain - terrain.min()) / (terrain.max() - terrain.min())
-    return terrain_norm > LAND_THRESHOLD, seed
+    heightmap = generate_heightmap(seed, cfg)
+    land = heightmap > cfg.LAND_THRESHOLD
+    if return_heightmap:
+        return land, seed, heightmap
+    return land, seed
@@ -2,14 +2,14 @@ import numpy as np
 from scipy.ndimage import label
 from config import GRID_SIZE
 
-def get_neighbors(x, y):
+def get_neighbors(x, y, size=GRID_SIZE):
     return [(x + dx, y + dy) for dx, dy in [(-1,0), (1,0), (0,-1), (0,1)]
-            if 0 <= x + dx < GRID_SIZE and 0 <= y + dy < GRID_SIZE]
+            if 0 <= x + dx < size and 0 <= y + dy < size]
 
 def get_frontier_cells(ownership, civ_id):
     civ_cells = np.argwhere(ownership == civ_id)
     return [(y, x) for y, x in civ_cells if any(ownership[ny, nx] != civ_id and ownership[ny, nx] != 0
-            for nx, ny in get_neighbors(x, y))]
+            for nx, ny in get_neighbors(x, y, ownership.shape[0]))]
 
 def get_disconnected_mask(ownership, civ_id):
     """Returns a boolean mask where disconnected civ territory is True"""
@@ -20,8 +20,9 @@ def get_disconnected_mask(ownership, civ_id):
         return np.zeros_like(ownership, dtype=bool)
 
     # Find the largest connected region
-    sizes = [(labeled == i).sum() for i in range(1, num + 1)]
-    largest_label = np.argmax(sizes) + 1
+    sizes = np.bincount(labeled.ravel())
+    sizes[0] = 0
+    largest_label = np.argmax(sizes)
 
     # Everything not in the largest region is disconnected
     return (labeled != largest_label) & civ_mask
@@ -1,7 +1,8 @@
 import numpy as np
-from config import GRID_SIZE, NUM_CIVS
+from matplotlib.colors import hsv_to_rgb
+from config import NUM_CIVS
 
-def get_color_map():
+def get_color_map(num_civs=NUM_CIVS):
     water_color = [0.2, 0.4, 1.0, 1.0]
     land_color = [0.8, 0.8, 0.7, 1.0]
     civ_colors = [
@@ -16,42 +17,77 @@ def get_color_map():
         [0.25, 0.75, 0.25, 0.5], [0.65, 0.65, 0.20, 0.5],
         [0.70, 0.40, 0.90, 0.5], [0.35, 0.85, 0.75, 0.5]
     ]
-    return [water_color, land_color] + civ_colors[:NUM_CIVS]
-
-def generate_colored_map(ownership, cmap_colors, get_neighbors, civ_names=None, name_to_color=None):
-    image = np.zeros((GRID_SIZE, GRID_SIZE, 4))
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            tile = ownership[y, x]
-
-            # Determine base color first
-            if tile < 2:
-                # Water or neutral, keep as before
-                color = cmap_colors[tile] if tile < len(cmap_colors) else [0.8, 0.8, 0.7, 1.0]
-            else:
-                # Check if civ name has a custom color override
-                if civ_names and name_to_color and tile - 2 < len(civ_names):
-                    civ_name = civ_names[tile - 2]
-                    if civ_name in name_to_color:
-                        color = name_to_color[civ_name]
-                        # Ensure it has alpha, add 1.0 if only RGB given
-                        if len(color) == 3:
-                            color = (*color, 1.0)
-                    else:
-                        color = cmap_colors[tile]
-                else:
-                    color = cmap_colors[tile]
-
-            # Determine alpha based on border status
-            is_border = any(ownership[ny, nx] != tile for nx, ny in get_neighbors(x, y))
-
-            if tile == 0:  # water
-                alpha = 0.3 if is_border else 1.0
-            else:
-                alpha = 1.0 if is_border else 0.5
-
-            # Set RGBA with proper alpha override
-            image[y, x] = list(color[:3]) + [alpha]
-
-    return image
+    # Past the hand-picked palette, spread extra hues by the golden angle
+    for i in range(len(civ_colors), num_civs):
+        hue = (i * 0.618033988749895) % 1.0
+        civ_colors.append(list(hsv_to_rgb([hue, 0.55 + 0.3 * (i % 2), 0.85])) + [0.5])
+    return [water_color, land_color] + civ_colors[:num_civs]
 
+def build_palette(cmap_colors, civ_names=None, name_to_color=None):
+    """RGBA lookup table indexed by [tile, is_border], with name overrides folded in"""
+    colors = [list(color[:3]) for color in cmap_colors]
+    if civ_names and name_to_color:
+        for i, civ_name in enumerate(civ_names):
+            if civ_name in name_to_color and i + 2 < len(colors):
+                colors[i + 2] = list(name_to_color[civ_name][:3])
+
+    palette = np.zeros((len(colors), 2, 4))
+    palette[:, :, :3] = np.array(colors)[:, None, :]
+    # Water fades at the coast, land and civs brighten at their borders
+    palette[:, 0, 3], palette[:, 1, 3] = 0.5, 1.0
+    palette[0, 0, 3], palette[0, 1, 3] = 1.0, 0.3
+    return (palette * 255).round().astype(np.uint8)
+
+def border_mask(ownership):
+    """True where a tile has an in-grid 4-neighbor with a different owner"""
+    padded = np.pad(ownership, 1, mode="edge")
+    return ((padded[:-2, 1:-1] != ownership) | (padded[2:, 1:-1] != ownership) |
+            (padded[1:-1, :-2] != ownership) | (padded[1:-1, 2:] != ownership))
+
+class MapRenderer:
+    """Turns ownership grids into RGBA images, repainting only what changed"""
+
+    def __init__(self, cmap_colors, civ_names=None, name_to_color=None):
+        self.palette = build_palette(cmap_colors, civ_names, name_to_color)
+        self.colors = (self.palette[:, 0] / 255).tolist()
+        self.image = None
+        self._last = None
+
+    def render(self, ownership, dirty=None):
+        """Returns the uint8 RGBA image for ownership.
+
+        dirty is an optional (y0, y1, x0, x1) rectangle of changed cells, or a
+        list of them (e.g. changed chunks); when omitted it is found by diffing
+        against the previous frame. Borders of cells just outside the
+        rectangles are refreshed too.
+        """
+        if self.image is None or self._last.shape != ownership.shape:
+            self.image = self.palette[ownership, border_mask(ownership).astype(np.intp)]
+            self._last = ownership.copy()
+            return self.image
+
+        if dirty is None:
+            ys, xs = np.nonzero(ownership != self._last)
+            if len(ys) == 0:
+                return self.image
+            dirty = (ys.min(), ys.max() + 1, xs.min(), xs.max() + 1)
+
+        for rect in (dirty if isinstance(dirty, list) else [dirty]):
+            self._repaint(ownership, rect)
+        return self.image
+
+    def _repaint(self, ownership, dirty):
+        height, width = ownership.shape
+        y0, y1, x0, x1 = dirty
+        y0, y1 = max(y0 - 1, 0), min(y1 + 1, height)
+        x0, x1 = max(x0 - 1, 0), min(x1 + 1, width)
+        # One extra ring of context so border tests see real neighbors
+        wy0, wy1 = max(y0 - 1, 0), min(y1 + 1, height)
+        wx0, wx1 = max(x0 - 1, 0), min(x1 + 1, width)
+        window = ownership[wy0:wy1, wx0:wx1]
+        border = border_mask(window)[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0]
+        self.image[y0:y1, x0:x1] = self.palette[ownership[y0:y1, x0:x1], border.astype(np.intp)]
+        self._last[y0:y1, x0:x1] = ownership[y0:y1, x0:x1]
+
+def generate_colored_map(ownership, cmap_colors, get_neighbors=None, civ_names=None, name_to_color=None):
+    return MapRenderer(cmap_colors, civ_names, name_to_color).render(ownership) / 255.0